@@ -114,11 +114,14 @@
 
 #     #TODO: read OpanAI API Responses and save to a copy of File A with new conversations 
 
+import io
 import json
 import re
 import os
 from openai import OpenAI  # Uncomment when ready to use
 
+from dataset_io import open_dataset
+
 # ---------------------------------------------------------
 # 1. PARSING HELPER
 # ---------------------------------------------------------
@@ -181,7 +184,8 @@ def generate_veterinary_prompts_with_context(json_a_path, jsonl_b_path):
     
     # Load File B (JSONL)
     try:
-        with open(jsonl_b_path, 'r', encoding='utf-8') as f:
+        # File B may be a gzip, zstd or xz compressed dump
+        with io.TextIOWrapper(open_dataset(jsonl_b_path), encoding='utf-8') as f:
             for line in f:
                 if not line.strip(): continue
                 data = json.loads(line)
@@ -0,0 +1,151 @@
+import codecs
+import gzip
+import hashlib
+import importlib.util
+import io
+import lzma
+import os
+
+import numpy as np
+
+# zstd needs the optional `zstandard` package; gzip and xz are in the standard library
+HAS_ZSTANDARD = importlib.util.find_spec("zstandard") is not None
+
+# Leading bytes of each supported compression format
+COMPRESSION_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "zstd": b"\x28\xb5\x2f\xfd",
+    "xz": b"\xfd7zXZ\x00",
+}
+
+# Bytes read per chunk while streaming a dataset
+READ_BUFFER_SIZE = 1 << 20
+
+# Bytes before the old end of a file compared to tell an append from a rewrite
+APPEND_CHECK_BYTES = 1 << 12
+
+JSON_WHITESPACE = b" \t\r\n"
+
+
+def atomic_write(path, write_fn):
+    """
+    Calls write_fn with a binary file, then moves that file to `path` in one step so
+    readers never see half of it. Returns False, leaving `path` as it was, if it
+    can't be written (e.g. a read-only data directory).
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def find_sorted(ids, key):
+    """Position of a prompt_id (str or bytes) in a sorted fixed-width byte array, or None."""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    if len(key) > ids.dtype.itemsize:
+        return None
+    i = int(np.searchsorted(ids, key))
+    if i < len(ids) and ids[i] == key:
+        return i
+    return None
+
+
+def detect_compression(stream):
+    """Compression format of a seekable binary stream from its magic bytes, or None. The position is kept."""
+    start = stream.tell()
+    head = stream.read(max(len(magic) for magic in COMPRESSION_MAGIC.values()))
+    stream.seek(start)
+    for name, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def sniff_json_format(stream):
+    """
+    Peeks at the first non-whitespace byte, after any UTF-8 BOM: "[" means a JSON array,
+    anything else is read as JSONL. Buffered streams are peeked, others read and rewound.
+    """
+    peek = getattr(stream, "peek", None)
+    if peek is not None:
+        head = peek(4096)[:4096]
+    else:
+        start = stream.tell()
+        head = stream.read(4096)
+        stream.seek(start)
+    head = head.lstrip(codecs.BOM_UTF8).lstrip(JSON_WHITESPACE)
+    return "json" if head.startswith(b"[") else "jsonl"
+
+
+def zstd_reader(stream, closefd):
+    """Buffered reader that decompresses a zstd stream as it is read."""
+    if not HAS_ZSTANDARD:
+        raise ValueError("The file is zstd-compressed, but the `zstandard` package is not installed.")
+    import zstandard
+    reader = zstandard.ZstdDecompressor().stream_reader(stream, read_size=READ_BUFFER_SIZE, closefd=closefd)
+    return io.BufferedReader(reader, READ_BUFFER_SIZE)
+
+
+def open_decompressed(stream):
+    """
+    Wraps a seekable binary stream so that reads return decompressed content,
+    decompressing on the fly. Uncompressed streams are returned unchanged, and
+    closing the wrapper leaves `stream` open.
+    """
+    compression = detect_compression(stream)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == "xz":
+        return lzma.LZMAFile(stream, mode="rb")
+    if compression == "zstd":
+        return zstd_reader(stream, closefd=False)
+    return stream
+
+
+def tail_digest(path, size):
+    """
+    Digest of the last APPEND_CHECK_BYTES of the first `size` bytes of a file. If a file
+    kept its inode, did not shrink and still has this digest at its old size, it was
+    only appended to.
+    """
+    start = max(0, size - APPEND_CHECK_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(size - start)).hexdigest()
+
+
+def skip_to(stream, offset):
+    """Moves a freshly opened stream to `offset`, reading forward when it can't seek (zstd)."""
+    if stream.seekable():
+        stream.seek(offset)
+        return
+    while offset > 0:
+        chunk = stream.read(min(offset, READ_BUFFER_SIZE))
+        if not chunk:
+            break
+        offset -= len(chunk)
+
+
+def open_dataset(path):
+    """Opens a local file for binary reading, transparently decompressing gzip, zstd and xz."""
+    f = open(path, "rb")
+    try:
+        compression = detect_compression(f)
+        if compression == "zstd":
+            return zstd_reader(f, closefd=True)
+    except Exception:
+        f.close()
+        raise
+    if compression is None:
+        return f
+    f.close()
+    return gzip.open(path, "rb") if compression == "gzip" else lzma.open(path, "rb")
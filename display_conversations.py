@@ -164,8 +164,11 @@
 import streamlit as st
 import json
 
+from perf_trace import start_trace, phase, finish_trace
+
 def main():
     st.set_page_config(page_title="Veterinary Q&A Editor", layout="wide")
+    start_trace("display_conversations")
 
     # --- 1. Session State Initialization ---
     if 'data' not in st.session_state:
@@ -179,7 +182,8 @@ def main():
 
     if uploaded_file is not None and not st.session_state['file_loaded']:
         try:
-            raw_data = json.load(uploaded_file)
+            with phase("parse"):
+                raw_data = json.load(uploaded_file)
             if isinstance(raw_data, list):
                 # Ensure every record has a status key, defaulting to Unapproved
                 for item in raw_data:
@@ -205,7 +209,8 @@ def main():
         st.sidebar.subheader("💾 Save Your Work")
         
         # Download logic
-        json_str = json.dumps(st.session_state['data'], indent=4)
+        with phase("serialise download"):
+            json_str = json.dumps(st.session_state['data'], indent=4)
         st.sidebar.download_button(
             label="Download Modified JSON",
             data=json_str,
@@ -218,18 +223,19 @@ def main():
         data = st.session_state['data']
         
         # Group by Topic
-        grouped_data = {}
-        for idx, item in enumerate(data):
-            topic = item.get('topic', 'Uncategorized') or 'Uncategorized'
-            if topic not in grouped_data:
-                grouped_data[topic] = []
-            grouped_data[topic].append({'original_index': idx, 'content': item})
+        with phase("grouping"):
+            grouped_data = {}
+            for idx, item in enumerate(data):
+                topic = item.get('topic', 'Uncategorized') or 'Uncategorized'
+                if topic not in grouped_data:
+                    grouped_data[topic] = []
+                grouped_data[topic].append({'original_index': idx, 'content': item})
 
         sorted_topics = sorted(grouped_data.keys())
         tabs = st.tabs(sorted_topics)
 
         for i, topic in enumerate(sorted_topics):
-            with tabs[i]:
+            with tabs[i], phase(f"tab {topic}"):
                 topic_items = grouped_data[topic]
                 
                 # Selector
@@ -313,54 +319,57 @@ def main():
                     st.warning("No conversation turns found.")
                 
                 # Loop through every turn in the conversation
-                for p_idx, msg in enumerate(prompts):
-                    role = msg.get('role', 'user')
-                    content = msg.get('content', '')
-                    turn_comment = msg.get('reviewer_comment', '')
-
-                    # Styling based on role
-                    if role == 'user':
-                        emoji = "🧑‍🌾"
-                        role_label = "User"
-                        color = "blue"
-                    else:
-                        emoji = "🩺"
-                        role_label = "Assistant"
-                        color = "green"
-
-                    with st.container(border=True):
-                        # Header for the turn
-                        st.markdown(f":{color}[**{emoji} {role_label} (Turn {p_idx+1})**]")
+                with phase("chat rendering"):
+                    for p_idx, msg in enumerate(prompts):
+                        role = msg.get('role', 'user')
+                        content = msg.get('content', '')
+                        turn_comment = msg.get('reviewer_comment', '')
+
+                        # Styling based on role
+                        if role == 'user':
+                            emoji = "🧑‍🌾"
+                            role_label = "User"
+                            color = "blue"
+                        else:
+                            emoji = "🩺"
+                            role_label = "Assistant"
+                            color = "green"
+
+                        with st.container(border=True):
+                            # Header for the turn
+                            st.markdown(f":{color}[**{emoji} {role_label} (Turn {p_idx+1})**]")
                         
-                        c_text, c_comment = st.columns([0.7, 0.3])
+                            c_text, c_comment = st.columns([0.7, 0.3])
                         
-                        # LEFT: The Conversation Text
-                        with c_text:
-                            new_text = st.text_area(
-                                "Content",
-                                value=content,
-                                height=100,
-                                label_visibility="collapsed",
-                                key=f"text_{original_index}_{p_idx}"
-                            )
-                            if new_text != content:
-                                st.session_state['data'][original_index]['prompt'][p_idx]['content'] = new_text
-
-                        # RIGHT: The Comment for this turn
-                        with c_comment:
-                            new_comment = st.text_area(
-                                "📝 Comment",
-                                value=turn_comment,
-                                height=100,
-                                placeholder="Add feedback for this turn...",
-                                label_visibility="collapsed",
-                                key=f"comment_{original_index}_{p_idx}"
-                            )
-                            if new_comment != turn_comment:
-                                st.session_state['data'][original_index]['prompt'][p_idx]['reviewer_comment'] = new_comment
+                            # LEFT: The Conversation Text
+                            with c_text:
+                                new_text = st.text_area(
+                                    "Content",
+                                    value=content,
+                                    height=100,
+                                    label_visibility="collapsed",
+                                    key=f"text_{original_index}_{p_idx}"
+                                )
+                                if new_text != content:
+                                    st.session_state['data'][original_index]['prompt'][p_idx]['content'] = new_text
+
+                            # RIGHT: The Comment for this turn
+                            with c_comment:
+                                new_comment = st.text_area(
+                                    "📝 Comment",
+                                    value=turn_comment,
+                                    height=100,
+                                    placeholder="Add feedback for this turn...",
+                                    label_visibility="collapsed",
+                                    key=f"comment_{original_index}_{p_idx}"
+                                )
+                                if new_comment != turn_comment:
+                                    st.session_state['data'][original_index]['prompt'][p_idx]['reviewer_comment'] = new_comment
 
     else:
         st.info("👆 Please upload a JSON file to start editing.")
 
+    finish_trace()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,794 @@
+import codecs
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from dataset_io import READ_BUFFER_SIZE, find_sorted, open_decompressed, sniff_json_format
+from language_detection import detect_languages
+
+# pyarrow is only needed for Parquet export, so it is imported on first use
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def get_pyarrow():
+    """(pyarrow, pyarrow.parquet), imported on first use."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def parse_tags(tag_list):
+    """Parses a list of strings like ["theme:x", "axis:y"] into a dict."""
+    parsed = {"theme": [], "axis": [], "other": []}
+    if not tag_list:
+        return parsed
+    
+    for tag in tag_list:
+        if isinstance(tag, str) and ":" in tag:
+            key, value = tag.split(":", 1)
+            if key in ["theme", "axis"]:
+                parsed[key].append(value)
+            else:
+                parsed["other"].append(tag)
+        else:
+            parsed["other"].append(str(tag))
+    return parsed
+
+
+def get_axes_from_rubric(rubrics):
+    """Extracts unique axes from the rubric list."""
+    axes = set()
+    if not rubrics:
+        return []
+    for r in rubrics:
+        for tag in r.get("tags", []):
+            if "axis:" in tag:
+                axes.add(tag.split(":", 1)[1])
+    return list(axes)
+
+
+def get_rubric_axis(rubric):
+    """The axis a single rubric criterion is graded on, or "General"."""
+    return next((t.split(":", 1)[1] for t in rubric.get("tags", []) if t.startswith("axis:")), "General")
+
+
+def sample_language_text(prompt_list):
+    """Joins the user turns of a conversation into the text used for language detection."""
+    return " ".join(str(msg.get("content", "")) for msg in prompt_list if msg.get("role") == "user")
+
+
+def get_turn_category(prompt_list):
+    """Categorizes the number of turns (messages) in the conversation."""
+    count = len(prompt_list)
+    if count <= 1:
+        return "1 turn"
+    elif 2 <= count <= 5:
+        return "2 - 5 turns"
+    elif 6 <= count <= 10:
+        return "6 - 10 turns"
+    elif 11 <= count <= 20:
+        return "11 - 20 turns"
+    else:
+        return "Over 20 turns"
+
+
+# Define the sort order for the turn filter so it appears logically in the UI
+TURN_SORT_ORDER = ["1 turn", "2 - 5 turns", "6 - 10 turns", "11 - 20 turns", "Over 20 turns"]
+
+# processed_meta fields that can be filtered on; list-valued fields match if any value is selected
+FACET_FIELDS = ["themes", "axes", "others", "language", "turn_category"]
+MULTI_VALUED_FIELDS = ["themes", "axes", "others"]
+
+
+class MetaColumns:
+    """
+    processed_meta of a whole dataset, stored as small integer codes into interned
+    vocabularies instead of one dict of string lists per record.
+    Single-valued fields hold one code per record; multi-valued fields use a CSR
+    layout where the codes of record i are codes[field][ptr[field][i]:ptr[field][i + 1]].
+    """
+    __slots__ = ("vocab", "codes", "ptr", "turn_counts")
+
+    def __init__(self, vocab, codes, ptr, turn_counts):
+        self.vocab = vocab
+        self.codes = codes
+        self.ptr = ptr
+        self.turn_counts = turn_counts
+
+    def __len__(self):
+        return len(self.turn_counts)
+
+    def values(self, field, pos):
+        """Decoded value(s) of one record, as processed_meta used to hold them."""
+        vocab = self.vocab[field]
+        if field in self.ptr:
+            ptr = self.ptr[field]
+            return [vocab[code] for code in self.codes[field][ptr[pos]:ptr[pos + 1]]]
+        return vocab[self.codes[field][pos]]
+
+
+class VocabularyBuilder:
+    """Assigns codes to values in first-seen order; finish() remaps them to the sorted vocabulary."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def code(self, value):
+        return self.codes.setdefault(sys.intern(value), len(self.codes))
+
+    def finish(self, raw_codes, sort_key=None):
+        values = sorted(self.codes, key=sort_key)
+        remap = np.zeros(len(values), dtype=np.int16)
+        for new_code, value in enumerate(values):
+            remap[self.codes[value]] = new_code
+        codes = remap[np.frombuffer(raw_codes, dtype=np.int16)]
+        return tuple(values), codes
+
+
+def build_prompt_index(prompt_ids):
+    """
+    Sorted fixed-width array of prompt_ids plus the record position of each, so a
+    prompt_id resolves with a binary search. Duplicates resolve to the first record.
+    """
+    ids = np.array(prompt_ids, dtype=np.bytes_) if prompt_ids else np.zeros(0, dtype="S1")
+    order = np.argsort(ids, kind="stable")
+    return {"ids": ids[order], "positions": order.astype(np.int32)}
+
+
+def build_facet_index(meta):
+    """
+    Maps every facet value to a sorted int32 array of the record positions that carry it.
+    Built once per dataset so filtering never has to walk the records again.
+    """
+    size = len(meta)
+    index = {"size": size}
+    for field in FACET_FIELDS:
+        codes = meta.codes[field]
+        rows = np.arange(size, dtype=np.int32)
+        if field in meta.ptr:
+            rows = np.repeat(rows, np.diff(meta.ptr[field]))
+        # A stable sort groups rows by code and keeps them ascending inside each group
+        order = np.argsort(codes, kind="stable")
+        sorted_rows = rows[order]
+        bounds = np.searchsorted(codes[order], np.arange(len(meta.vocab[field]) + 1))
+        index[field] = {
+            value: sorted_rows[bounds[code]:bounds[code + 1]] for code, value in enumerate(meta.vocab[field])
+        }
+    return index
+
+
+def facet_mask(index, field, selected):
+    """Boolean mask of the records matching any of the selected values (union)."""
+    mask = np.zeros(index["size"], dtype=bool)
+    for value in selected:
+        positions = index[field].get(value)
+        if positions is not None:
+            mask[positions] = True
+    return mask
+
+
+def filter_positions(index, selections):
+    """
+    Intersects the per-facet unions. `selections` maps a facet field to its selected values;
+    an empty selection means the facet is not filtered, like the multiselects in the sidebar.
+    """
+    mask = np.ones(index["size"], dtype=bool)
+    for field, selected in selections.items():
+        if selected:
+            mask &= facet_mask(index, field, selected)
+    return np.flatnonzero(mask)
+
+
+def facet_counts(meta, index, selections, base_mask=None):
+    """
+    For every facet value, the number of records it would match given the selections
+    of the *other* facets (and `base_mask`, e.g. the search hits), as faceted search
+    engines show them. Each facet's mask is built once from the facet index and the
+    counts come from one bincount over the facet's codes.
+    Returns {field: {value: count}}.
+    """
+    size = index["size"]
+    masks = {field: facet_mask(index, field, selected) for field, selected in selections.items() if selected}
+    counts = {}
+    for field in FACET_FIELDS:
+        mask = base_mask.copy() if base_mask is not None else np.ones(size, dtype=bool)
+        for other, other_mask in masks.items():
+            if other != field:
+                mask &= other_mask
+        codes = meta.codes[field]
+        if field in meta.ptr:
+            # Expand the record mask to the record's values
+            codes = codes[np.repeat(mask, np.diff(meta.ptr[field]))]
+        else:
+            codes = codes[mask]
+        field_counts = np.bincount(codes, minlength=len(meta.vocab[field]))
+        counts[field] = dict(zip(meta.vocab[field], field_counts.tolist()))
+    return counts
+
+
+def process_data(records, language_cache_path=None):
+    """
+    Computes processed_meta for every record in a single pass over `records`,
+    which may be a generator. Records are not modified. Detected languages are
+    cached on disk at language_cache_path.
+    Returns (meta_columns, facet_index, rubric_columns, prompt_index).
+    """
+    vocabs = {field: VocabularyBuilder() for field in FACET_FIELDS}
+    raw_codes = {field: array("h") for field in FACET_FIELDS}
+    ptr = {field: array("i", [0]) for field in MULTI_VALUED_FIELDS}
+    turn_counts = array("i")
+    lang_texts = []
+    prompt_ids = []
+
+    # One row per rubric criterion, for the analytics tab
+    rubric_record = array("i")
+    rubric_points = array("f")
+    rubric_axis = array("h")
+    rubric_axis_vocab = VocabularyBuilder()
+    
+    for item in records:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid data format: every record must be a JSON object")
+        pos = len(turn_counts)
+        tags = parse_tags(item.get("example_tags", []))
+        rubrics = item.get("rubrics", []) or []
+        prompt = item.get("prompt", [])
+
+        item_values = {
+            "themes": dict.fromkeys(tags["theme"]),
+            "axes": get_axes_from_rubric(rubrics),
+            "others": dict.fromkeys(tags["other"]),
+        }
+        for field, values in item_values.items():
+            raw_codes[field].extend(vocabs[field].code(value) for value in values)
+            ptr[field].append(len(raw_codes[field]))
+
+        # Calculate Turns
+        raw_codes["turn_category"].append(vocabs["turn_category"].code(get_turn_category(prompt)))
+        turn_counts.append(len(prompt))
+        lang_texts.append(sample_language_text(prompt))
+        prompt_id = item.get("prompt_id")
+        prompt_ids.append(prompt_id.encode("utf-8") if isinstance(prompt_id, str) else b"")
+
+        for r in rubrics:
+            rubric_record.append(pos)
+            points = r.get("points", 0)
+            rubric_points.append(points if isinstance(points, (int, float)) else 0)
+            rubric_axis.append(rubric_axis_vocab.code(get_rubric_axis(r)))
+
+    # Language detection is the expensive step, so it runs as one batch at the end
+    for lang in detect_languages(lang_texts, cache_path=language_cache_path):
+        raw_codes["language"].append(vocabs["language"].code(lang))
+
+    vocab = {}
+    codes = {}
+    for field in FACET_FIELDS:
+        # Sort lengths based on our custom logic
+        sort_key = (lambda x: TURN_SORT_ORDER.index(x) if x in TURN_SORT_ORDER else 99) if field == "turn_category" else None
+        vocab[field], codes[field] = vocabs[field].finish(raw_codes[field], sort_key)
+
+    meta = MetaColumns(
+        vocab=vocab,
+        codes=codes,
+        ptr={field: np.frombuffer(offsets, dtype=np.int32) for field, offsets in ptr.items()},
+        turn_counts=np.frombuffer(turn_counts, dtype=np.int32),
+    )
+    facet_index = build_facet_index(meta)
+
+    # Rubric axes become codes into the sorted axis list; -1 stands for "General"
+    axis_codes = {axis: code for code, axis in enumerate(vocab["axes"])}
+    rubric_axis_remap = np.full(len(rubric_axis_vocab.codes), -1, dtype=np.int16)
+    for axis, raw_code in rubric_axis_vocab.codes.items():
+        rubric_axis_remap[raw_code] = axis_codes.get(axis, -1)
+    rubric_columns = {
+        "record": np.frombuffer(rubric_record, dtype=np.int32),
+        "points": np.frombuffer(rubric_points, dtype=np.float32),
+        "axis": rubric_axis_remap[np.frombuffer(rubric_axis, dtype=np.int16)],
+    }
+    return meta, facet_index, rubric_columns, build_prompt_index(prompt_ids)
+
+
+def stream_size(stream):
+    """Total size of a seekable binary stream, or None if it can't be determined."""
+    size = getattr(stream, "size", None)  # Streamlit's UploadedFile
+    if size is not None:
+        return size
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    try:
+        pos = stream.tell()
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(pos)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def iter_jsonl_records(stream, stats):
+    """Yields one record per line of a binary JSONL stream, counting lines that fail to parse."""
+    for line in stream:
+        stats["bytes_read"] += len(line)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            stats["malformed"] += 1
+
+
+def iter_json_array_records(stream, stats):
+    """
+    Yields the elements of a top-level JSON array one at a time, decoding the
+    stream chunk by chunk so the full text never exists as a single string.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    pos = 0
+    eof = False
+    # What comes next: "[", the first element or "]", an element, or "," / "]"
+    expect = "open"
+
+    def fill(buf):
+        nonlocal eof
+        chunk = stream.read(READ_BUFFER_SIZE)
+        stats["bytes_read"] += len(chunk)
+        eof = not chunk
+        return buf + text_decoder.decode(chunk, final=eof)
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            buf, pos = fill(buf[pos:]), 0
+            continue
+
+        char = buf[pos]
+        if expect == "open":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            expect = "first"
+            pos += 1
+            continue
+        if expect == "separator":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Could not parse JSON array: expected ',' or ']', found {char!r}")
+            expect = "element"
+            pos += 1
+            continue
+        if expect == "first" and char == "]":
+            return
+        if char in ",]":
+            raise ValueError(f"Could not parse JSON array: expected a value, found {char!r}")
+
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ValueError(f"Could not parse JSON array: {e}")
+            # The element continues in the next chunk
+            buf, pos = fill(buf[pos:]), 0
+            continue
+        if not eof and (end == len(buf) or buf[end] not in " \t\r\n,]"):
+            # A number cut at the chunk boundary would decode as a shorter value
+            buf, pos = fill(buf[pos:]), 0
+            continue
+        yield record
+        pos = end
+        expect = "separator"
+
+
+def load_json_or_jsonl(file_content, progress_callback=None):
+    """
+    Streams records out of an uploaded file, a binary file handle or a string.
+    gzip, zstd and xz content is decompressed on the fly.
+    Returns (records, malformed_line_count, spans); progress_callback receives the fraction read.
+    For plain JSONL, spans is the (offsets, lengths) of each record's line so it can be
+    copied unchanged; it is None for JSON arrays and compressed input.
+    """
+    if isinstance(file_content, str):
+        # It's already a string context
+        stream = io.BytesIO(file_content.encode("utf-8"))
+    elif isinstance(file_content, bytes):
+        stream = io.BytesIO(file_content)
+    else:
+        # It's a file object (from uploader) or a handle opened with 'rb'
+        stream = file_content
+        stream.seek(0)
+
+    total_size = stream_size(stream)
+    stats = {"bytes_read": 0, "malformed": 0}
+    source = stream
+    stream = open_decompressed(source)
+    fmt = sniff_json_format(stream)
+    spans = None
+    if fmt == "json":
+        records_iter = iter_json_array_records(stream, stats)
+    elif stream is source:
+        offsets = array("q")
+        lengths = array("q")
+        spans = (offsets, lengths)
+
+        def iter_spanned_records():
+            for offset, length, record in iter_jsonl_spans(stream, stats):
+                offsets.append(offset)
+                lengths.append(length)
+                yield record
+
+        records_iter = iter_spanned_records()
+    else:
+        records_iter = iter_jsonl_records(stream, stats)
+
+    def fraction_read():
+        # Compressed input: progress is measured on the compressed bytes consumed
+        return (stats["bytes_read"] if stream is source else source.tell()) / total_size
+
+    data = []
+    for record in records_iter:
+        data.append(record)
+        if progress_callback and total_size and len(data) % 1000 == 0:
+            progress_callback(min(fraction_read(), 1.0))
+
+    if progress_callback:
+        progress_callback(1.0)
+    if not data:
+        # Don't crash immediately, return empty list or raise specific error
+        raise ValueError("Could not parse file as JSON or JSONL")
+    return data, stats["malformed"], spans
+
+
+def iter_jsonl_spans(stream, stats, progress_callback=None):
+    """
+    Walks a binary JSONL file line by line and yields (offset, length, record)
+    for every line that parses. The length excludes the newline.
+    """
+    total_size = stream_size(stream)
+    pos = 0
+    count = 0
+    for line in stream:
+        stats["bytes_read"] += len(line)
+        content = line.rstrip(b"\n")
+        if content.strip():
+            try:
+                record = json.loads(content)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                stats["malformed"] += 1
+            else:
+                yield pos, len(content), record
+                count += 1
+                if progress_callback and total_size and count % 1000 == 0:
+                    progress_callback(min((pos + len(line)) / total_size, 1.0))
+        pos += len(line)
+    if progress_callback:
+        progress_callback(1.0)
+
+
+def read_file_span(file, offset, length):
+    """`length` bytes of a file at `offset`; a ValueError if the file has since been truncated."""
+    data = os.pread(file.fileno(), length, offset)
+    if len(data) != length:
+        raise ValueError(f"{file.name} was truncated after it was loaded; reload the page.")
+    return data
+
+
+class LazyJsonlRecords:
+    """
+    Read-only sequence over a JSONL file. Only the offset table is held in memory;
+    a record is read with os.pread and decoded each time it is accessed.
+
+    The file stays open for as long as the dataset lives. If it is replaced on disk
+    the old content is still read; if it is truncated, reads past the new end raise
+    a ValueError (a memory map would take the whole server down with SIGBUS).
+    """
+
+    def __init__(self, file, offsets, lengths):
+        self.file = file
+        self.offsets = offsets
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, pos):
+        return json.loads(self.raw_line(pos))
+
+    def raw_line(self, pos):
+        """The record's original line as bytes, without the newline."""
+        return read_file_span(self.file, int(self.offsets[pos]), int(self.lengths[pos]))
+
+
+class ParsedJsonlRecords:
+    """
+    Eagerly parsed records of a plain JSONL source, plus the span of each one's line
+    so exports copy the original bytes. read_span(offset, length) reads the source.
+    """
+
+    def __init__(self, records, read_span, offsets, lengths):
+        self.records = records
+        self.read_span = read_span
+        self.offsets = offsets
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, pos):
+        return self.records[pos]
+
+    def raw_line(self, pos):
+        """The record's original line as bytes, without the newline."""
+        return self.read_span(int(self.offsets[pos]), int(self.lengths[pos]))
+
+
+def with_line_spans(records, spans, read_span):
+    """Frozen eager records, wrapped with their line spans when the source was plain JSONL."""
+    records = freeze_records(records)
+    if spans is None:
+        return records
+    offsets, lengths = spans
+    return ParsedJsonlRecords(records, read_span, readonly_array(offsets, np.int64), readonly_array(lengths, np.int64))
+
+
+def readonly_array(values, dtype):
+    """numpy array that raises on write, so shared datasets can't be modified by a session."""
+    array = np.asarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def intern_record_strings(record):
+    """
+    Interns the strings that repeat across records (tags, roles, rubric criteria and
+    the keys of rubric and message dicts) so every copy shares one string object.
+    Only used on freshly parsed records, before the dataset is shared.
+    """
+    intern = sys.intern
+    tags = record.get("example_tags")
+    if isinstance(tags, list):
+        record["example_tags"] = [intern(t) if isinstance(t, str) else t for t in tags]
+    prompt = record.get("prompt")
+    if isinstance(prompt, list):
+        record["prompt"] = [
+            {intern(k): (intern(v) if k == "role" and isinstance(v, str) else v) for k, v in msg.items()}
+            if isinstance(msg, dict) else msg
+            for msg in prompt
+        ]
+    rubrics = record.get("rubrics")
+    if isinstance(rubrics, list):
+        interned = []
+        for r in rubrics:
+            if isinstance(r, dict):
+                r = {intern(k): v for k, v in r.items()}
+                if isinstance(r.get("criterion"), str):
+                    r["criterion"] = intern(r["criterion"])
+                if isinstance(r.get("tags"), list):
+                    r["tags"] = [intern(t) if isinstance(t, str) else t for t in r["tags"]]
+            interned.append(r)
+        record["rubrics"] = interned
+    return record
+
+
+def freeze_records(records):
+    """Read-only, string-interned tuple of eagerly loaded records."""
+    return tuple(intern_record_strings(record) if isinstance(record, dict) else record for record in records)
+
+
+class Dataset:
+    """
+    Immutable, process-wide view of one loaded file. It is built once per file
+    through st.cache_resource and shared by every browser session; sessions only
+    keep their own navigation indices in st.session_state.
+    """
+    __slots__ = (
+        "records", "malformed", "meta", "themes", "axes", "others", "langs", "lengths",
+        "facet_index", "digest", "rubric_columns", "prompt_index",
+    )
+
+    def __init__(self, digest, records, malformed, meta, facet_index, rubric_columns, prompt_index):
+        # Content digest of the source; every cache derived from this dataset is keyed on it
+        self.digest = digest
+        self.records = records
+        self.malformed = malformed
+
+        # Array-backed processed_meta; the facet lists are its vocabularies
+        self.meta = meta
+        for column in [meta.turn_counts, *meta.codes.values(), *meta.ptr.values()]:
+            column.setflags(write=False)
+        self.themes = meta.vocab["themes"]
+        self.axes = meta.vocab["axes"]
+        self.others = meta.vocab["others"]
+        self.langs = meta.vocab["language"]
+        self.lengths = meta.vocab["turn_category"]
+
+        for field in FACET_FIELDS:
+            for positions in facet_index[field].values():
+                positions.setflags(write=False)
+        self.facet_index = facet_index
+        # One row per rubric criterion: owning record position, points and axis code
+        self.rubric_columns = {name: readonly_array(column, column.dtype) for name, column in rubric_columns.items()}
+        # Sorted prompt_ids and their record positions, for deep links
+        self.prompt_index = {name: readonly_array(column, column.dtype) for name, column in prompt_index.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def find_prompt(self, prompt_id):
+        """Record position of a prompt_id, or None if it isn't in the dataset."""
+        i = find_sorted(self.prompt_index["ids"], prompt_id)
+        return None if i is None else int(self.prompt_index["positions"][i])
+
+    @property
+    def turn_counts(self):
+        return self.meta.turn_counts
+
+    def language(self, pos):
+        return self.meta.values("language", pos)
+
+
+def sample_search_text(record):
+    """Text that full-text search looks at: prompt turns, ideal completion and rubric criteria."""
+    parts = [str(msg.get("content", "")) for msg in record.get("prompt", []) or []]
+
+    ideal = record.get("ideal_completions_data")
+    if isinstance(ideal, dict):
+        parts.append(str(ideal.get("ideal_completion", "")))
+    elif isinstance(ideal, list):
+        parts.extend(str(x) for x in ideal)
+    elif ideal:
+        parts.append(str(ideal))
+
+    parts.extend(str(r.get("criterion", "")) for r in record.get("rubrics", []) or [])
+    return "\n".join(parts)
+
+
+class LruCache:
+    """
+    Small thread-safe LRU shared by all sessions. claim() lets a background
+    producer mark a key as in progress so it isn't computed twice.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def claim(self, key):
+        """True if `key` is neither cached nor already being computed."""
+        with self.lock:
+            if key in self.entries or key in self.pending:
+                return False
+            self.pending.add(key)
+            return True
+
+    def put(self, key, entry):
+        with self.lock:
+            self.pending.discard(key)
+            if entry is None:
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+# Export format -> (file suffix, mime type)
+EXPORT_FORMATS = {
+    "JSONL": (".jsonl", "application/jsonl"),
+    "JSONL (gzip)": (".jsonl.gz", "application/gzip"),
+}
+if HAS_PYARROW:
+    EXPORT_FORMATS["Parquet"] = (".parquet", "application/vnd.apache.parquet")
+else:
+    EXPORT_FORMATS["CSV"] = (".csv", "text/csv")
+
+
+# Columnar exports keep the record fields (nested ones as JSON text) plus the derived facets
+EXPORT_COLUMNS = [
+    "prompt_id", "themes", "language", "turns", "turn_category",
+    "example_tags", "prompt", "ideal_completions_data", "rubrics",
+]
+EXPORT_BATCH_SIZE = 1000
+
+# Spill the export to disk past this size; Streamlit still reads the finished file into memory
+EXPORT_SPOOL_BYTES = 64 * 1024 * 1024
+
+
+def iter_export_lines(dataset, positions):
+    """
+    JSONL lines of the given records. Records from a plain JSONL source are copied
+    byte for byte; those from JSON arrays or compressed files are re-serialised.
+    """
+    raw_line = getattr(dataset.records, "raw_line", None)
+    for pos in positions:
+        if raw_line is not None:
+            yield raw_line(int(pos)) + b"\n"
+        else:
+            yield json.dumps(dataset.records[int(pos)], ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def export_row(dataset, pos):
+    """One flat row of a columnar export."""
+    record = dataset.records[pos]
+
+    def as_text(value):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    return {
+        "prompt_id": as_text(record.get("prompt_id")),
+        "themes": ",".join(dataset.meta.values("themes", pos)),
+        "language": dataset.language(pos),
+        "turns": int(dataset.turn_counts[pos]),
+        "turn_category": dataset.meta.values("turn_category", pos),
+        "example_tags": as_text(record.get("example_tags")),
+        "prompt": as_text(record.get("prompt")),
+        "ideal_completions_data": as_text(record.get("ideal_completions_data")),
+        "rubrics": as_text(record.get("rubrics")),
+    }
+
+
+def write_export(dataset, positions, export_format, out):
+    """Writes the records at `positions` to the binary file `out`, one record (or batch) at a time."""
+    if export_format == "JSONL":
+        for line in iter_export_lines(dataset, positions):
+            out.write(line)
+    elif export_format == "JSONL (gzip)":
+        with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+            for line in iter_export_lines(dataset, positions):
+                gz.write(line)
+    elif export_format == "Parquet":
+        pa, pq = get_pyarrow()
+        schema = pa.schema([(name, pa.int32() if name == "turns" else pa.string()) for name in EXPORT_COLUMNS])
+        with pq.ParquetWriter(out, schema) as writer:
+            for start in range(0, len(positions), EXPORT_BATCH_SIZE):
+                rows = [export_row(dataset, int(pos)) for pos in positions[start:start + EXPORT_BATCH_SIZE]]
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    elif export_format == "CSV":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        writer = csv.DictWriter(text, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for pos in positions:
+            writer.writerow(export_row(dataset, int(pos)))
+        # Hand `out` back to the caller open
+        text.detach()
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+def make_export(dataset, positions, export_format):
+    """
+    Deferred download for st.download_button: the export is only written when the
+    button is clicked, streaming into a spooled temporary file.
+    """
+    def export():
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as out:
+            write_export(dataset, positions, export_format, out)
+            out.seek(0)
+            return out.read()
+    return export
@@ -682,17 +682,45 @@
 #                 st.warning("No rubrics found.")
 
 import streamlit as st
+import time
+SCRIPT_START = time.perf_counter()
 import json
-import pandas as pd
-import io
+import numpy as np
 import os
-
-# Try to import langdetect
-try:
-    from langdetect import detect
-    HAS_LANGDETECT = True
-except ImportError:
-    HAS_LANGDETECT = False
+import hashlib
+import pickle
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+# Language detection runs in a process pool and is cached on disk (see language_detection.py)
+from language_detection import HAS_LANGDETECT, warm_up_detector
+from text_search import BM25Index
+from dataset_io import READ_BUFFER_SIZE, atomic_write, detect_compression, sniff_json_format
+# Parsing, facet indexes, the Dataset and exports; the script only holds the UI and caching
+from explorer_data import (
+    EXPORT_FORMATS,
+    Dataset,
+    LazyJsonlRecords,
+    LruCache,
+    facet_counts,
+    filter_positions,
+    freeze_records,
+    get_rubric_axis,
+    iter_jsonl_spans,
+    load_json_or_jsonl,
+    make_export,
+    process_data,
+    read_file_span,
+    readonly_array,
+    sample_search_text,
+    with_line_spans,
+)
+from perf_trace import start_trace, phase, finish_trace
+
+IMPORT_SECONDS = time.perf_counter() - SCRIPT_START
+
+# Language profiles load in the background while the dataset is read
+warm_up_detector()
 
 # ==========================================
 # CONFIGURATION
@@ -700,6 +728,14 @@ except ImportError:
 # 1. Set your specific default file path here
 DEFAULT_FILE_PATH = "healthbench/2025-05-07-06-14-12_oss_eval.jsonl" 
 
+# 2. Preprocessed snapshots are written next to the source file with this suffix.
+#    Bump the schema version whenever the shape of processed_meta changes.
+SNAPSHOT_SUFFIX = ".explorer-snapshot.pkl"
+SNAPSHOT_SCHEMA_VERSION = 7
+
+# 3. Detected languages are cached by text hash, shared by the eval file and the turn-group splits
+LANGUAGE_CACHE_PATH = "healthbench/.langdetect_cache.pkl"
+
 # ==========================================
 # 1. EMBEDDED DEMO DATA (Fallback)
 # ==========================================
@@ -716,142 +752,477 @@ DEMO_JSON_DATA = """
 # 2. HELPER FUNCTIONS
 # ==========================================
 
-def parse_tags(tag_list):
-    """Parses a list of strings like ["theme:x", "axis:y"] into a dict."""
-    parsed = {"theme": [], "axis": [], "other": []}
-    if not tag_list:
-        return parsed
-    
-    for tag in tag_list:
-        if isinstance(tag, str) and ":" in tag:
-            key, value = tag.split(":", 1)
-            if key in ["theme", "axis"]:
-                parsed[key].append(value)
-            else:
-                parsed["other"].append(tag)
-        else:
-            parsed["other"].append(str(tag))
-    return parsed
-
-def get_axes_from_rubric(rubrics):
-    """Extracts unique axes from the rubric list."""
-    axes = set()
-    if not rubrics:
-        return []
-    for r in rubrics:
-        for tag in r.get("tags", []):
-            if "axis:" in tag:
-                axes.add(tag.split(":", 1)[1])
-    return list(axes)
-
-def detect_sample_language(prompt_list):
-    if not HAS_LANGDETECT:
-        return "unknown"
-    
-    text_content = ""
-    for msg in prompt_list:
-        if msg.get("role") == "user":
-            text_content += " " + str(msg.get("content", ""))
-    
-    if len(text_content.strip()) < 3:
-        return "unknown"
-        
-    try:
-        return detect(text_content)
-    except:
-        return "unknown"
-
-def get_turn_category(prompt_list):
-    """Categorizes the number of turns (messages) in the conversation."""
-    count = len(prompt_list)
-    if count <= 1:
-        return "1 turn"
-    elif 2 <= count <= 5:
-        return "2 - 5 turns"
-    elif 6 <= count <= 10:
-        return "6 - 10 turns"
-    elif 11 <= count <= 20:
-        return "11 - 20 turns"
-    else:
-        return "Over 20 turns"
+def get_pandas():
+    """pandas, imported on first use: only the rubric table and analytics need it."""
+    import pandas as pd
+    return pd
 
-# Define the sort order for the turn filter so it appears logically in the UI
-TURN_SORT_ORDER = ["1 turn", "2 - 5 turns", "6 - 10 turns", "11 - 20 turns", "Over 20 turns"]
+@st.cache_resource
+def get_startup_timings():
+    """Process-wide record of the first (cold) script run."""
+    return {}
 
-@st.cache_data
-def process_data(raw_data):
-    processed_data = []
-    
-    all_themes = set()
-    all_axes = set()
-    all_others = set()
-    all_langs = set()
-    all_lengths = set()
-    
-    for item in raw_data:
-        tags = parse_tags(item.get("example_tags", []))
-        rubric_axes = get_axes_from_rubric(item.get("rubrics", []))
-        prompt = item.get("prompt", [])
-        lang = detect_sample_language(prompt)
-        
-        # Calculate Turns
-        turn_cat = get_turn_category(prompt)
-        
-        item_themes = tags["theme"]
-        item_others = tags["other"]
-        
-        all_themes.update(item_themes)
-        all_axes.update(rubric_axes)
-        all_others.update(item_others)
-        all_langs.add(lang)
-        all_lengths.add(turn_cat)
-        
-        item['processed_meta'] = {
-            'themes': item_themes,
-            'axes': rubric_axes,
-            'others': item_others,
-            'language': lang,
-            'turn_category': turn_cat,
-            'turn_count': len(prompt)
-        }
-        processed_data.append(item)
-    
-    # Sort lengths based on our custom logic
-    sorted_lengths = sorted(list(all_lengths), key=lambda x: TURN_SORT_ORDER.index(x) if x in TURN_SORT_ORDER else 99)
-        
-    return processed_data, sorted(list(all_themes)), sorted(list(all_axes)), sorted(list(all_others)), sorted(list(all_langs)), sorted_lengths
-
-def load_json_or_jsonl(file_content):
-    # Determine if input is file-like or string
-    if hasattr(file_content, 'read'):
-         # It's a file object (from uploader)
-        try:
-            content = file_content.getvalue().decode("utf-8")
-        except:
-             # If it's a regular file handle opened with 'r'
-             file_content.seek(0)
-             content = file_content.read()
-    else:
-        # It's already a string context
-        content = file_content
+def snapshot_path_for(source_path):
+    """Returns the path of the preprocessed snapshot that belongs to a source file."""
+    return source_path + SNAPSHOT_SUFFIX
 
+def load_snapshot(source_path, content_hash):
+    """Loads a snapshot if it matches the source hash and schema, otherwise returns None."""
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        data = []
-        # splitlines handles string content
-        lines = content.splitlines()
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    data.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
-        if not data:
-            # Don't crash immediately, return empty list or raise specific error
-            raise ValueError("Could not parse file as JSON or JSONL")
-        return data
+        with open(snapshot_path_for(source_path), "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+
+    if not isinstance(snapshot, dict):
+        return None
+    if snapshot.get("schema") != SNAPSHOT_SCHEMA_VERSION:
+        return None
+    if snapshot.get("source_hash") != content_hash:
+        return None
+    # A snapshot built without langdetect only holds "unknown" languages
+    if snapshot.get("has_langdetect") != HAS_LANGDETECT:
+        return None
+    return snapshot
+
+def snapshot_processed(snapshot):
+    """The process_data output stored in a snapshot."""
+    return snapshot["meta"], snapshot["facet_index"], snapshot["rubric_columns"], snapshot["prompt_index"]
+
+def save_snapshot(source_path, content_hash, processed, spans=None):
+    """
+    Writes the snapshot atomically; a read-only data directory is not an error.
+    `processed` is the output of process_data; `spans` holds the (offsets, lengths)
+    table of a lazily loaded JSONL file.
+    """
+    meta, facet_index, rubric_columns, prompt_index = processed
+    snapshot = {
+        "schema": SNAPSHOT_SCHEMA_VERSION,
+        "source_hash": content_hash,
+        "has_langdetect": HAS_LANGDETECT,
+        "meta": meta,
+        "facet_index": facet_index,
+        "rubric_columns": rubric_columns,
+        "prompt_index": prompt_index,
+        "spans": spans,
+    }
+    atomic_write(snapshot_path_for(source_path), lambda f: pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+def stream_digest(stream):
+    """Content digest of a binary stream, read in chunks; the stream is rewound afterwards."""
+    digest = hashlib.blake2b(digest_size=20)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(READ_BUFFER_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _file_digest(path, size, mtime_ns, inode):
+    with open(path, "rb") as f:
+        return stream_digest(f)
+
+def file_content_hash(path):
+    """
+    Digest of a local file. The file is only read again when its size, mtime
+    or inode changes, so on a rerun this is a stat call plus a cache lookup.
+    """
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _upload_digest(file_id, _uploaded_file):
+    return stream_digest(_uploaded_file)
+
+def uploaded_file_hash(uploaded_file):
+    """Digest of an upload, computed once per upload (Streamlit gives each one a new file_id)."""
+    return _upload_digest(uploaded_file.file_id, uploaded_file)
+
+def make_sidebar_progress(label):
+    """
+    Progress bar in the sidebar plus the callback the loader reports to.
+    Cached loaders create it themselves so Streamlit can replay it on a cache hit.
+    """
+    bar = st.sidebar.progress(0.0, text=label)
+    return bar, lambda fraction: bar.progress(fraction, text=label)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_local_dataset(source_path, content_hash, lazy):
+    """
+    Loads a local file, reusing its on-disk snapshot when the content hash matches.
+    In lazy mode only an offset table of the JSONL file is kept and records are read
+    from it on access; otherwise every record is parsed and held in memory.
+    """
+    snapshot = load_snapshot(source_path, content_hash)
+    progress_bar, on_progress = make_sidebar_progress(f"Parsing {source_path}...")
+
+    if lazy:
+        # Kept open by the records, so they read the content this dataset was built from
+        source = open(source_path, "rb")
+
+        if snapshot is not None and snapshot.get("spans") is not None:
+            offsets, lengths, malformed = snapshot["spans"]
+            records = LazyJsonlRecords(source, offsets, lengths)
+            progress_bar.empty()
+            return Dataset(content_hash, records, malformed, *snapshot_processed(snapshot))
+
+        offsets = []
+        lengths = []
+        stats = {"bytes_read": 0, "malformed": 0}
+
+        def scan():
+            for offset, length, record in iter_jsonl_spans(source, stats, on_progress):
+                offsets.append(offset)
+                lengths.append(length)
+                yield record
+
+        with phase("scan + process_data"):
+            processed = process_data(scan(), LANGUAGE_CACHE_PATH)
+        offsets = readonly_array(offsets, np.int64)
+        lengths = readonly_array(lengths, np.int32)
+        save_snapshot(source_path, content_hash, processed, spans=(offsets, lengths, stats["malformed"]))
+        progress_bar.empty()
+        return Dataset(content_hash, LazyJsonlRecords(source, offsets, lengths), stats["malformed"], *processed)
+
+    # The loader parses straight from the file handle; for plain JSONL it stays open
+    # so exports can copy each record's line from it
+    source = open(source_path, "rb")
+    with phase("parse"):
+        records, malformed, spans = load_json_or_jsonl(source, on_progress)
+    if spans is None:
+        source.close()
+    if snapshot is not None and len(snapshot["meta"]) == len(records):
+        processed = snapshot_processed(snapshot)
+    else:
+        with phase("process_data"):
+            processed = process_data(records, LANGUAGE_CACHE_PATH)
+        save_snapshot(source_path, content_hash, processed)
+    progress_bar.empty()
+    return Dataset(content_hash, with_line_spans(records, spans, partial(read_file_span, source)), malformed, *processed)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_uploaded_dataset(_uploaded_file, content_hash):
+    """Parses an upload; keyed on its digest so Streamlit never hashes the file contents itself."""
+    progress_bar, on_progress = make_sidebar_progress(f"Parsing {_uploaded_file.name}...")
+    with phase("parse"):
+        records, malformed, spans = load_json_or_jsonl(_uploaded_file, on_progress)
+    with phase("process_data"):
+        processed = process_data(records, LANGUAGE_CACHE_PATH)
+    progress_bar.empty()
+    # The upload's bytes are already held by Streamlit; getvalue() doesn't copy them
+    content = _uploaded_file.getvalue()
+    read_span = lambda offset, length: content[offset:offset + length]
+    return Dataset(content_hash, with_line_spans(records, spans, read_span), malformed, *processed)
+
+@st.cache_resource(show_spinner=False)
+def load_demo_dataset():
+    records = json.loads(DEMO_JSON_DATA)
+    digest = hashlib.blake2b(DEMO_JSON_DATA.encode("utf-8"), digest_size=20).hexdigest()
+    return Dataset(digest, freeze_records(records), 0, *process_data(records, LANGUAGE_CACHE_PATH))
+
+@st.cache_resource(show_spinner="Building search index...", max_entries=4)
+def get_search_index(digest, _dataset):
+    """BM25 index over a dataset, built on the first search and shared by all sessions."""
+    records = _dataset.records
+    return BM25Index(sample_search_text(records[pos]) for pos in range(len(records)))
+
+# Recent filter combinations kept per process
+FILTER_CACHE_SIZE = 32
+
+@st.cache_resource
+def get_filter_cache():
+    """Filter results shared by all sessions, keyed by filter_state_key."""
+    return LruCache(FILTER_CACHE_SIZE)
+
+def filter_state_key(dataset, selections, query=""):
+    """Hashable key of a filter combination (and search query) on a given dataset."""
+    return (dataset.digest, query) + tuple((field, frozenset(values)) for field, values in sorted(selections.items()))
+
+def compute_filter_state(dataset, selections, query, key):
+    """
+    Filtered positions of one filter combination. With a search query the positions
+    are the search hits that pass the filters, best match first.
+    Per-theme splits start empty and are filled in by get_theme_positions the first
+    time a tab needs them.
+    """
+    positions = filter_positions(dataset.facet_index, selections)
+    mask = np.zeros(len(dataset), dtype=bool)
+    mask[positions] = True
+    search_mask = None
+    if query:
+        hits, _ = get_search_index(dataset.digest, dataset).search(query)
+        search_mask = np.zeros(len(dataset), dtype=bool)
+        search_mask[hits] = True
+        positions = hits[mask[hits]]
+        mask[:] = False
+        mask[positions] = True
+    # The state is shared between sessions through the filter cache
+    positions.setflags(write=False)
+    return {
+        "key": key,
+        "positions": positions,
+        "active_themes": {
+            theme for theme, theme_pos in dataset.facet_index["themes"].items() if mask[theme_pos].any()
+        },
+        "theme_positions": {},
+        "facet_counts": facet_counts(dataset.meta, dataset.facet_index, selections, search_mask),
+    }
+
+def get_filter_state(dataset, selections, query=""):
+    """
+    Filter state for the current selections. The session keeps its current state;
+    on a change, recent combinations from any session are reused from the filter cache.
+    """
+    key = filter_state_key(dataset, selections, query)
+    state = st.session_state.get("filter_state")
+    if state is None or state["key"] != key:
+        cache = get_filter_cache()
+        state = cache.get(key)
+        if state is None:
+            state = compute_filter_state(dataset, selections, query, key)
+            cache.put(key, state)
+        st.session_state["filter_state"] = state
+    return state
+
+def get_theme_positions(dataset, state, theme_name):
+    """
+    Positions of the filtered samples in one theme tab, computed once per filter change.
+    The order of the filtered positions (e.g. search ranking) is kept.
+    """
+    positions = state["theme_positions"].get(theme_name)
+    if positions is None:
+        if theme_name == "Uncategorized/Other":
+            positions = state["positions"]
+        else:
+            theme_mask = np.zeros(len(dataset), dtype=bool)
+            theme_mask[dataset.facet_index["themes"][theme_name]] = True
+            positions = state["positions"][theme_mask[state["positions"]]]
+            positions.setflags(write=False)
+        state["theme_positions"][theme_name] = positions
+    return positions
+
+ANALYTICS_TAB = "📊 Analytics"
+
+def compute_analytics(dataset, positions):
+    """
+    Aggregates for the filtered samples, computed with numpy/pandas over the
+    dataset's columns rather than by walking the records.
+    """
+    pd = get_pandas()
+    mask = np.zeros(len(dataset), dtype=bool)
+    mask[positions] = True
+
+    rubrics = dataset.rubric_columns
+    rubric_mask = mask[rubrics["record"]]
+    points = rubrics["points"][rubric_mask]
+    axis_names = np.array(list(dataset.axes) + ["General"], dtype=object)
+    # Code -1 ("General") wraps around to the last name
+    axes = axis_names[rubrics["axis"][rubric_mask]]
+
+    rubric_df = pd.DataFrame({"Axis": axes, "Points": points})
+    points_by_axis = pd.crosstab(rubric_df["Points"], rubric_df["Axis"])
+    axis_summary = rubric_df.groupby("Axis")["Points"].agg(["count", "mean", "min", "max"])
+    axis_summary["positive"] = rubric_df[rubric_df["Points"] > 0].groupby("Axis").size()
+    axis_summary["negative"] = rubric_df[rubric_df["Points"] < 0].groupby("Axis").size()
+    axis_summary = axis_summary.fillna(0).astype({"positive": int, "negative": int})
+
+    turn_counts = dataset.turn_counts[positions]
+    turn_hist = pd.Series(np.bincount(turn_counts), name="Samples").rename_axis("Turns")
+    turn_hist = turn_hist[turn_hist > 0]
+
+    # Theme x axis co-occurrence as a product of per-record incidence matrices
+    theme_incidence = np.zeros((len(positions), len(dataset.themes)), dtype=np.int32)
+    axis_incidence = np.zeros((len(positions), len(dataset.axes)), dtype=np.int32)
+    rank = np.full(len(dataset), -1, dtype=np.int64)
+    rank[positions] = np.arange(len(positions))
+    for col, theme in enumerate(dataset.themes):
+        rows = rank[dataset.facet_index["themes"][theme]]
+        theme_incidence[rows[rows >= 0], col] = 1
+    for col, axis in enumerate(dataset.axes):
+        rows = rank[dataset.facet_index["axes"][axis]]
+        axis_incidence[rows[rows >= 0], col] = 1
+    cooccurrence = pd.DataFrame(
+        theme_incidence.T @ axis_incidence, index=list(dataset.themes), columns=list(dataset.axes)
+    )
+
+    return {
+        "samples": len(positions),
+        "criteria": int(len(points)),
+        "positive": int((points > 0).sum()),
+        "negative": int((points < 0).sum()),
+        "points_by_axis": points_by_axis,
+        "axis_summary": axis_summary,
+        "turn_hist": turn_hist,
+        "cooccurrence": cooccurrence,
+    }
+
+def render_analytics(analytics):
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Samples", analytics["samples"])
+    c2.metric("Criteria", analytics["criteria"])
+    c3.metric("Positive criteria", analytics["positive"])
+    c4.metric("Negative criteria", analytics["negative"])
+
+    st.subheader("Rubric points per axis")
+    st.bar_chart(analytics["points_by_axis"])
+    st.dataframe(analytics["axis_summary"], use_container_width=True)
+
+    st.subheader("Conversation length (turns)")
+    st.bar_chart(analytics["turn_hist"])
+
+    st.subheader("Theme × axis co-occurrence")
+    st.caption("Number of filtered samples with the theme that have at least one criterion on the axis.")
+    st.dataframe(analytics["cooccurrence"], use_container_width=True)
+
+# URL query parameter -> facet field, e.g. ?prompt_id=...&theme=hedging&langs=en,fr
+DEEP_LINK_FILTERS = {
+    "themes": "themes",
+    "langs": "language",
+    "lengths": "turn_category",
+    "axes": "axes",
+    "tags": "others",
+}
+
+def get_deep_link(dataset, query_params):
+    """
+    Resolves the URL query parameters once per session (and again only if they change):
+    filter values per facet, the tab to open and the record position of `prompt_id`.
+    Unknown values are ignored.
+    """
+    key = (dataset.digest,) + tuple(sorted((name, tuple(query_params.get_all(name))) for name in query_params.keys()))
+    link = st.session_state.get("deep_link")
+    if link is not None and link["key"] == key:
+        return link
+
+    link = {"key": key, "filters": {}, "pos": None, "tab": None, "pending": False}
+    for param, field in DEEP_LINK_FILTERS.items():
+        allowed = set(dataset.meta.vocab[field])
+        values = [v.strip() for raw in query_params.get_all(param) for v in raw.split(",")]
+        values = [v for v in dict.fromkeys(values) if v in allowed]
+        if values:
+            link["filters"][field] = values
+
+    prompt_id = query_params.get("prompt_id", "").strip()
+    if prompt_id:
+        link["pos"] = dataset.find_prompt(prompt_id)
+        link["pending"] = link["pos"] is not None
+
+    theme = query_params.get("theme")
+    if theme in dataset.themes:
+        link["tab"] = theme
+    elif link["pos"] is not None:
+        sample_themes = dataset.meta.values("themes", link["pos"])
+        link["tab"] = sample_themes[0] if sample_themes else None
+
+    st.session_state["deep_link"] = link
+    return link
+
+def deep_link_defaults(dataset, link, field, defaults):
+    """
+    Default selection of one filter: the link's values if given, otherwise the usual
+    defaults widened to include the linked sample so that it isn't filtered out.
+    """
+    if field in link["filters"]:
+        return link["filters"][field]
+    if link["pos"] is None or not defaults:
+        return defaults
+    sample_values = dataset.meta.values(field, link["pos"])
+    if isinstance(sample_values, str):
+        sample_values = [sample_values]
+    if not sample_values or any(v in defaults for v in sample_values):
+        return defaults
+    return list(defaults) + sample_values[:1]
+
+# Rendered rubric tables kept per process (least recently used are dropped first)
+RUBRIC_TABLE_CACHE_SIZE = 256
+
+def rubric_frame(dataset, pos, rubrics):
+    """
+    Points, Axis and Criterion of one record's rubric. Points and axes come from the
+    pre-computed rubric columns; only the criterion text is read from the record.
+    """
+    pd = get_pandas()
+    columns = dataset.rubric_columns
+    # Rubric rows are stored in record order, so a record's rows are one slice
+    start, end = np.searchsorted(columns["record"], [pos, pos + 1])
+    if end - start != len(rubrics):
+        return pd.DataFrame([
+            {"Points": r.get("points", 0), "Axis": get_rubric_axis(r), "Criterion": r.get("criterion", "")}
+            for r in rubrics
+        ])
+    # Axis code -1 ("General") picks the last entry
+    axis_names = np.array(list(dataset.axes) + ["General"], dtype=object)
+    return pd.DataFrame({
+        "Points": columns["points"][start:end],
+        "Axis": axis_names[columns["axis"][start:end]],
+        "Criterion": [r.get("criterion", "") for r in rubrics],
+    })
+
+@st.cache_data(show_spinner=False, max_entries=RUBRIC_TABLE_CACHE_SIZE)
+def render_rubric_table(digest, prompt_id, _dataset, pos, _rubrics, _frame=None):
+    """
+    Builds and styles one record's rubric table. Streamlit stores the rendered
+    element, so going back to a sample replays it instead of styling it again.
+    The record position is part of the key, since prompt_ids can repeat in a file.
+    """
+    df = _frame if _frame is not None else rubric_frame(_dataset, pos, _rubrics)
+    st.dataframe(
+        df.style.map(color_points, subset=["Points"]),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Criterion": st.column_config.TextColumn("Criterion", width="large"),
+            "Points": st.column_config.NumberColumn("Pts", format="%d"),
+            "Axis": st.column_config.TextColumn("Axis", width="small"),
+        }
+    )
+
+# Decoded neighbours of the displayed samples, shared by all sessions
+PREFETCH_CACHE_SIZE = 64
+
+@st.cache_resource
+def get_prefetcher():
+    """Process-wide (executor, cache) for warming up neighbouring samples."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch"), LruCache(PREFETCH_CACHE_SIZE)
+
+def warm_sample(dataset, pos):
+    """Decodes a record and builds its rubric frame; runs on a prefetch thread."""
+    sample = dataset.records[pos]
+    rubrics = sample.get("rubrics", [])
+    return {"sample": sample, "rubric_frame": rubric_frame(dataset, pos, rubrics) if rubrics else None}
+
+def prefetch_samples(dataset, positions):
+    """Warms up the given record positions in the background."""
+    executor, cache = get_prefetcher()
+    for pos in positions:
+        key = (dataset.digest, pos)
+        if not cache.claim(key):
+            continue
+
+        def task(pos=pos, key=key):
+            entry = None
+            try:
+                entry = warm_sample(dataset, pos)
+            finally:
+                cache.put(key, entry)
+
+        executor.submit(task)
+
+def get_prefetched(dataset, pos):
+    """The warmed-up entry of a record position, or None."""
+    return get_prefetcher()[1].get((dataset.digest, pos))
+
+def report_startup_time():
+    """Records the first script run of this process as the cold start and reports it in the sidebar."""
+    run_seconds = time.perf_counter() - SCRIPT_START
+    timings = get_startup_timings()
+    if "cold_start" not in timings:
+        timings["cold_start"] = run_seconds
+        timings["imports"] = IMPORT_SECONDS
+    st.sidebar.caption(
+        f"⏱️ Cold start {timings['cold_start']:.2f} s (imports {timings['imports']:.2f} s) · "
+        f"this run {run_seconds * 1000:.0f} ms"
+    )
 
 def color_points(val):
     color = 'green' if val > 0 else 'red' if val < 0 else 'black'
@@ -862,63 +1233,93 @@ def color_points(val):
 # ==========================================
 
 st.set_page_config(layout="wide", page_title="Dataset Explorer")
+start_trace("healthbench")
 
 st.title("🩺 HealthBench Dataset Explorer")
 
 # --- SIDEBAR ---
 st.sidebar.header("📂 Data Source")
-uploaded_file = st.sidebar.file_uploader("Upload JSON or JSONL", type=["json", "jsonl"])
+uploaded_file = st.sidebar.file_uploader(
+    "Upload JSON or JSONL (optionally .gz, .zst or .xz)", type=["json", "jsonl", "gz", "zst", "xz"]
+)
 
-raw_json = None
+dataset = None
 
 if uploaded_file is not None:
     try:
-        raw_json = load_json_or_jsonl(uploaded_file)
+        with phase("load"):
+            dataset = load_uploaded_dataset(uploaded_file, uploaded_file_hash(uploaded_file))
         st.sidebar.success(f"Loaded: {uploaded_file.name}")
-        st.sidebar.info(f"Total Records: {len(raw_json)}")
+        st.sidebar.info(f"Total Records: {len(dataset)}")
     except Exception as e:
         st.sidebar.error(f"Error reading file: {e}")
 
 # NEW LOGIC: Check for default local file if no upload
 elif os.path.exists(DEFAULT_FILE_PATH):
     try:
-        with open(DEFAULT_FILE_PATH, "r", encoding="utf-8") as f:
-            # We read the file content to pass to our loader
-            content = f.read()
-            raw_json = load_json_or_jsonl(content)
+        source_hash = file_content_hash(DEFAULT_FILE_PATH)
+        with open(DEFAULT_FILE_PATH, "rb") as f:
+            # Compressed files can't be read at an offset, so they are always parsed eagerly
+            can_read_lazily = detect_compression(f) is None and sniff_json_format(f) == "jsonl"
+        lazy_mode = can_read_lazily and st.sidebar.toggle(
+            "Lazy record access",
+            value=True,
+            help="Keep only record offsets in memory and read a record from the file when it is displayed.",
+        )
+        with phase("load"):
+            dataset = load_local_dataset(DEFAULT_FILE_PATH, source_hash, lazy_mode)
         st.sidebar.success(f"Loaded default: {DEFAULT_FILE_PATH}")
-        st.sidebar.info(f"Total Records: {len(raw_json)}")
+        st.sidebar.info(f"Total Records: {len(dataset)}")
     except Exception as e:
         st.sidebar.warning(f"Could not load default file: {e}")
         st.sidebar.info("Using embedded demo data.")
-        raw_json = json.loads(DEMO_JSON_DATA)
+        dataset = load_demo_dataset()
 else:
     st.sidebar.info("Using embedded demo data.")
-    raw_json = json.loads(DEMO_JSON_DATA)
+    dataset = load_demo_dataset()
+
+if dataset is None:
+    finish_trace()
+    st.stop()
+
+if dataset.malformed:
+    st.sidebar.warning(f"⚠️ Skipped {dataset.malformed} malformed line(s).")
 
 if not HAS_LANGDETECT:
     st.sidebar.warning("⚠️ `langdetect` not installed. Language detection disabled.")
 
-# --- PROCESS DATA ---
-if raw_json:
-    if not isinstance(raw_json, list):
-        st.error("Invalid data format.")
-        st.stop()
-    data, available_themes, available_axes, available_others, available_langs, available_lengths = process_data(raw_json)
-else:
-    st.stop()
+# The dataset is shared by all sessions and never copied; everything below only reads it
+data = dataset.records
+facet_index = dataset.facet_index
+available_themes = list(dataset.themes)
+available_axes = list(dataset.axes)
+available_others = list(dataset.others)
+available_langs = list(dataset.langs)
+available_lengths = list(dataset.lengths)
+
+# --- DEEP LINK ---
+# Resolved before any filter widget exists, so the first paint already shows the linked sample
+deep_link = get_deep_link(dataset, st.query_params)
+if st.query_params.get("prompt_id") and deep_link["pos"] is None:
+    st.warning(f"prompt_id `{st.query_params.get('prompt_id')}` from the link was not found in this dataset.")
 
 # --- FILTERS ---
 st.sidebar.header("🔍 Filters")
-selected_themes = st.sidebar.multiselect("Theme", available_themes, default=available_themes)
+search_query = st.sidebar.text_input(
+    "Search text",
+    placeholder="e.g. epinephrine",
+    help="Searches prompts, ideal completions and rubric criteria. All words must match; results are ranked by BM25.",
+).strip()
+default_themes = deep_link_defaults(dataset, deep_link, "themes", available_themes)
 
 # MODIFIED: Default Language set to 'en'
-if HAS_LANGDETECT and len(available_langs) > 0:
+show_language_filter = HAS_LANGDETECT and len(available_langs) > 0
+if show_language_filter:
     # Check if 'en' is in the available languages, otherwise default to all
     default_langs = ['en'] if 'en' in available_langs else available_langs
-    selected_langs = st.sidebar.multiselect("Language", available_langs, default=default_langs)
+    default_langs = deep_link_defaults(dataset, deep_link, "language", default_langs)
 else:
-    selected_langs = available_langs
+    default_langs = available_langs
 
 # MODIFIED: Default Turns set to '2 - 5 turns' and '6 - 10 turns'
 target_defaults = ["2 - 5 turns", "6 - 10 turns"]
@@ -926,65 +1327,129 @@ target_defaults = ["2 - 5 turns", "6 - 10 turns"]
 default_lengths = [x for x in target_defaults if x in available_lengths]
 if not default_lengths: 
     default_lengths = available_lengths # Fallback if targets don't exist
-
-selected_lengths = st.sidebar.multiselect("Conversation Length", available_lengths, default=default_lengths)
-
-selected_axes = st.sidebar.multiselect("Axis (Rubric)", available_axes)
-selected_others = st.sidebar.multiselect("Category/Tag", available_others)
+default_lengths = deep_link_defaults(dataset, deep_link, "turn_category", default_lengths)
+
+filter_defaults = {
+    "themes": default_themes,
+    "axes": deep_link_defaults(dataset, deep_link, "axes", []),
+    "others": deep_link_defaults(dataset, deep_link, "others", []),
+    "turn_category": default_lengths,
+}
+if HAS_LANGDETECT:
+    filter_defaults["language"] = default_langs
+
+# The option counts of each filter depend on the other filters, so the current
+# selections are read from the widgets' keys before any of them is drawn
+selections = {
+    field: [v for v in st.session_state.get(f"filter_{field}", default) if v in dataset.facet_index[field]]
+    for field, default in filter_defaults.items()
+}
+with phase("filtering"):
+    filter_state = get_filter_state(dataset, selections, search_query)
+option_counts = filter_state["facet_counts"]
+
+def facet_multiselect(label, field, options):
+    """Sidebar multiselect over a facet, with each option's live count in its label."""
+    counts = option_counts[field]
+    return st.sidebar.multiselect(
+        label,
+        options,
+        default=filter_defaults[field],
+        key=f"filter_{field}",
+        format_func=lambda value: f"{value} ({counts.get(value, 0)})",
+    )
+
+selected_themes = facet_multiselect("Theme", "themes", available_themes)
+if show_language_filter:
+    selected_langs = facet_multiselect("Language", "language", available_langs)
+else:
+    selected_langs = available_langs
+selected_lengths = facet_multiselect("Conversation Length", "turn_category", available_lengths)
+selected_axes = facet_multiselect("Axis (Rubric)", "axes", available_axes)
+selected_others = facet_multiselect("Category/Tag", "others", available_others)
 
 # --- FILTER LOGIC ---
-filtered_data = []
-for item in data:
-    meta = item['processed_meta']
-    has_theme = not selected_themes or any(t in selected_themes for t in meta['themes'])
-    has_axis = not selected_axes or any(a in selected_axes for a in meta['axes'])
-    has_other = not selected_others or any(o in selected_others for o in meta['others'])
-    has_length = not selected_lengths or meta['turn_category'] in selected_lengths
-    
-    has_lang = True
-    if HAS_LANGDETECT:
-        has_lang = not selected_langs or meta['language'] in selected_langs
-    
-    if has_theme and has_axis and has_other and has_lang and has_length:
-        filtered_data.append(item)
+# Unions within a facet and intersections across facets, computed on the facet index
+selections = {
+    "themes": selected_themes,
+    "axes": selected_axes,
+    "others": selected_others,
+    "turn_category": selected_lengths,
+}
+if HAS_LANGDETECT:
+    selections["language"] = selected_langs
+
+# Same selections as read above, so this is normally the state that is already there
+filter_state = get_filter_state(dataset, selections, search_query)
+filtered_positions = filter_state["positions"]
 
 st.sidebar.markdown("---")
-st.sidebar.write(f"**Samples Matched:** {len(filtered_data)}")
-
-if not filtered_data:
+st.sidebar.write(f"**Samples Matched:** {len(filtered_positions)}")
+
+# --- EXPORT ---
+export_format = st.sidebar.selectbox("Export format", list(EXPORT_FORMATS))
+export_suffix, export_mime = EXPORT_FORMATS[export_format]
+st.sidebar.download_button(
+    "⬇️ Export filtered samples",
+    data=make_export(dataset, filtered_positions, export_format),
+    file_name=f"healthbench_filtered{export_suffix}",
+    mime=export_mime,
+    on_click="ignore",
+    disabled=not len(filtered_positions),
+)
+
+if not len(filtered_positions):
     st.warning("No samples match your filters.")
+    report_startup_time()
+    finish_trace()
     st.stop()
 
 # --- TABS ---
-active_themes_in_data = set()
-for item in filtered_data:
-    active_themes_in_data.update(item['processed_meta']['themes'])
+active_themes_in_data = filter_state["active_themes"]
 
 tabs_to_create = [t for t in selected_themes if t in active_themes_in_data]
 if not tabs_to_create:
     tabs_to_create = ["Uncategorized/Other"]
+tabs_to_create.append(ANALYTICS_TAB)
 
-tabs = st.tabs(tabs_to_create)
+# Tabs track which one is open, so only the visible tab is built on a rerun
+link_tab = deep_link["tab"] if deep_link["tab"] in tabs_to_create else None
+if deep_link["pending"] and link_tab is None and "Uncategorized/Other" in tabs_to_create:
+    link_tab = "Uncategorized/Other"
+tabs = st.tabs(tabs_to_create, key="theme_tab", on_change="rerun", default=link_tab)
 
 for tab, theme_name in zip(tabs, tabs_to_create):
-    with tab:
+    if tab.open is False:
+        continue
+    if theme_name == ANALYTICS_TAB:
+        with tab, phase(f"tab {theme_name}"):
+            # Computed once per filter change, like the theme splits
+            if "analytics" not in filter_state:
+                filter_state["analytics"] = compute_analytics(dataset, filtered_positions)
+            render_analytics(filter_state["analytics"])
+        continue
+    with tab, phase(f"tab {theme_name}"):
         # Get data for this specific theme
-        if theme_name == "Uncategorized/Other":
-            tab_samples = filtered_data
-        else:
-            tab_samples = [d for d in filtered_data if theme_name in d['processed_meta']['themes']]
+        tab_positions = get_theme_positions(dataset, filter_state, theme_name)
         
-        if not tab_samples:
+        if not len(tab_positions):
             st.write("No samples.")
             continue
             
-        count = len(tab_samples)
+        count = len(tab_positions)
 
         # --- NAVIGATION LOGIC ---
         session_key = f"idx_{theme_name}"
         
         if session_key not in st.session_state:
             st.session_state[session_key] = 0
+
+        # Jump to the linked sample once; afterwards Previous/Next take over
+        if deep_link["pending"] and theme_name == link_tab:
+            matches = np.flatnonzero(tab_positions == deep_link["pos"])
+            if len(matches):
+                st.session_state[session_key] = int(matches[0])
+            deep_link["pending"] = False
             
         # Safety check if filtering changed list size
         if st.session_state[session_key] >= count:
@@ -1014,12 +1479,17 @@ for tab, theme_name in zip(tabs, tabs_to_create):
                 unsafe_allow_html=True
             )
 
-        sample = tab_samples[st.session_state[session_key]]
+        sample_pos = int(tab_positions[st.session_state[session_key]])
+        # In lazy mode this is where the record gets decoded, unless the prefetch
+        # after the previous render has already done it
+        warm = get_prefetched(dataset, sample_pos)
+        with phase("record decode"):
+            sample = warm["sample"] if warm else data[sample_pos]
         
         # --- DISPLAY CONTENT ---
         st.divider()
-        lang_badge = f"mapped lang: `{sample['processed_meta']['language']}`" if HAS_LANGDETECT else ""
-        turn_badge = f"turns: `{sample['processed_meta']['turn_count']}`"
+        lang_badge = f"mapped lang: `{dataset.language(sample_pos)}`" if HAS_LANGDETECT else ""
+        turn_badge = f"turns: `{dataset.turn_counts[sample_pos]}`"
         
         st.markdown(f"### 🆔 `{sample.get('prompt_id', 'N/A')}` {lang_badge} {turn_badge}")
         
@@ -1029,7 +1499,7 @@ for tab, theme_name in zip(tabs, tabs_to_create):
         col_chat, col_rubric = st.columns([1, 1])
 
         # LEFT: Chat
-        with col_chat:
+        with col_chat, phase("chat rendering"):
             st.subheader("💬 Context")
             chat_container = st.container(border=True)
             with chat_container:
@@ -1051,30 +1521,20 @@ for tab, theme_name in zip(tabs, tabs_to_create):
                         st.write(ideal)
 
         # RIGHT: Rubric
-        with col_rubric:
+        with col_rubric, phase("rubric table"):
             st.subheader("✅ Rubric")
             rubrics = sample.get("rubrics", [])
             if rubrics:
-                rubric_data = []
-                for r in rubrics:
-                    r_tags = r.get("tags", [])
-                    axis_tag = next((t.split(":", 1)[1] for t in r_tags if t.startswith("axis:")), "General")
-                    rubric_data.append({
-                        "Points": r.get("points", 0),
-                        "Axis": axis_tag,
-                        "Criterion": r.get("criterion", ""),
-                    })
-                
-                df = pd.DataFrame(rubric_data)
-                st.dataframe(
-                    df.style.map(color_points, subset=["Points"]),
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "Criterion": st.column_config.TextColumn("Criterion", width="large"),
-                        "Points": st.column_config.NumberColumn("Pts", format="%d"),
-                        "Axis": st.column_config.TextColumn("Axis", width="small"),
-                    }
-                )
+                prompt_id = sample.get("prompt_id") or f"#{sample_pos}"
+                frame = warm["rubric_frame"] if warm else None
+                render_rubric_table(dataset.digest, prompt_id, dataset, sample_pos, rubrics, frame)
             else:
                 st.warning("No rubrics found.")
+
+        # Warm up the previous and next samples while the user reads this one
+        prefetch_samples(
+            dataset, [int(tab_positions[i]) for i in (current_idx + 1, current_idx - 1) if 0 <= i < count]
+        )
+
+report_startup_time()
+finish_trace()
@@ -0,0 +1,134 @@
+import hashlib
+import importlib.util
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from dataset_io import atomic_write
+
+# langdetect is only imported when a text actually needs detecting (see get_detector)
+HAS_LANGDETECT = importlib.util.find_spec("langdetect") is not None
+
+_detector = None
+_detector_lock = threading.Lock()
+_warm_up_started = False
+
+# Only the start of a conversation is needed to tell its language
+MAX_DETECT_CHARS = 1000
+
+# Below this many uncached texts the process pool costs more than it saves
+MIN_PARALLEL_BATCH = 64
+
+CACHE_SCHEMA_VERSION = 1
+
+
+def get_detector():
+    """
+    Imports langdetect and loads its language profiles on first use, then
+    returns langdetect.detect. Safe to call from several threads.
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                from langdetect import detect, DetectorFactory
+                from langdetect.detector_factory import init_factory
+                # langdetect is randomised by default; a fixed seed keeps cached results stable
+                DetectorFactory.seed = 0
+                init_factory()
+                _detector = detect
+    return _detector
+
+
+def warm_up_detector():
+    """Loads the language profiles in a background thread, once per process."""
+    global _warm_up_started
+    if not HAS_LANGDETECT or _warm_up_started:
+        return
+    _warm_up_started = True
+    threading.Thread(target=get_detector, name="langdetect-warm-up", daemon=True).start()
+
+
+def detect_language(text):
+    """Detects the language of a single text, returning "unknown" on failure."""
+    if not HAS_LANGDETECT or len(text.strip()) < 3:
+        return "unknown"
+    try:
+        return get_detector()(text)
+    except Exception:
+        return "unknown"
+
+
+def text_key(text):
+    """Cache key for a (already truncated) text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_cache(cache_path):
+    """Loads the {text hash: language} cache, or an empty dict if it is missing or stale."""
+    if not cache_path:
+        return {}
+    try:
+        with open(cache_path, "rb") as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("schema") != CACHE_SCHEMA_VERSION:
+        return {}
+    return cache.get("languages", {})
+
+
+def save_cache(cache_path, new_entries):
+    """
+    Merges new entries into the cache file. The file is re-read first so that
+    several explorer sessions working on different files don't drop each other's results.
+    """
+    if not cache_path or not new_entries:
+        return
+    languages = load_cache(cache_path)
+    languages.update(new_entries)
+    cache = {"schema": CACHE_SCHEMA_VERSION, "languages": languages}
+    atomic_write(cache_path, lambda f: pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def detect_languages(texts, cache_path=None, max_workers=None):
+    """
+    Detects the language of every text, in input order.
+
+    Texts are truncated to MAX_DETECT_CHARS, looked up in the on-disk cache by hash,
+    and only the misses are sent to a process pool spanning all cores.
+    """
+    if not HAS_LANGDETECT:
+        return ["unknown"] * len(texts)
+
+    texts = [text[:MAX_DETECT_CHARS] for text in texts]
+    keys = [text_key(text) for text in texts]
+    cache = load_cache(cache_path)
+
+    # Deduplicate misses so repeated conversations are only detected once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cache and key not in missing:
+            missing[key] = text
+
+    if missing:
+        missing_keys = list(missing)
+        missing_texts = [missing[key] for key in missing_keys]
+        workers = max_workers or os.cpu_count() or 1
+
+        if workers > 1 and len(missing_texts) >= MIN_PARALLEL_BATCH:
+            # spawn rather than fork: the Streamlit server is multi-threaded
+            context = multiprocessing.get_context("spawn")
+            chunksize = max(1, len(missing_texts) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = list(executor.map(detect_language, missing_texts, chunksize=chunksize))
+        else:
+            results = [detect_language(text) for text in missing_texts]
+
+        new_entries = dict(zip(missing_keys, results))
+        cache.update(new_entries)
+        save_cache(cache_path, new_entries)
+
+    return [cache[key] for key in keys]
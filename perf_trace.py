@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager, nullcontext
+
+import streamlit as st
+
+# Tracing is opt-in: set the environment variable, or add ?perf=1 to the app's URL.
+# ?perf=1 only times the phases; memory is traced only when the environment variable is set,
+# since tracemalloc slows down every session of the process while it runs.
+PERF_TRACE_ENV = "EXPLORER_PERF_TRACE"
+PERF_QUERY_PARAM = "perf"
+# When set, every traced run is appended to this JSONL file
+PERF_TRACE_FILE_ENV = "EXPLORER_PERF_TRACE_FILE"
+
+# Streamlit runs each session's script in its own thread
+_local = threading.local()
+
+# Memory traces across all sessions: how many are in progress, and how many have started.
+# tracemalloc runs while one is in progress, unless something else had already started it.
+_memory_lock = threading.Lock()
+_memory_traces = {"active": 0, "started": 0, "owns_tracemalloc": False}
+
+
+def _begin_memory_trace():
+    """Starts tracemalloc if needed; returns (traces started so far, whether others are in progress)."""
+    with _memory_lock:
+        if _memory_traces["active"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_traces["owns_tracemalloc"] = True
+        _memory_traces["active"] += 1
+        _memory_traces["started"] += 1
+        return _memory_traces["started"], _memory_traces["active"] > 1
+
+
+def _end_memory_trace():
+    with _memory_lock:
+        _memory_traces["active"] -= 1
+        if _memory_traces["active"] == 0 and _memory_traces["owns_tracemalloc"]:
+            tracemalloc.stop()
+            _memory_traces["owns_tracemalloc"] = False
+
+
+class PerfTrace:
+    """
+    Wall time, and optionally peak traced memory, of the named phases of one script run.
+
+    Memory comes from tracemalloc, which is process-wide: it is started with the
+    first memory trace and stopped when the last one ends. Its peak counter is
+    shared too, so a run that overlaps another traced run reports no memory figures.
+    """
+
+    def __init__(self, app, trace_path=None, memory=False):
+        self.app = app
+        self.trace_path = trace_path
+        self.memory = memory
+        self.phases = []
+        if memory:
+            self.start_number, self.started_among_others = _begin_memory_trace()
+            # Runs when the trace ends, or when the trace of a run that ended early is dropped
+            self.release = weakref.finalize(self, _end_memory_trace)
+            if not self.overlapped:
+                tracemalloc.reset_peak()
+        # The run itself is the root of the phase stack
+        self.stack = [{"start_memory": self.traced_memory()[0], "peak": 0}]
+        self.started = time.perf_counter()
+
+    @property
+    def overlapped(self):
+        """Whether another memory trace was in progress at some point during this one."""
+        return self.memory and (self.started_among_others or _memory_traces["started"] != self.start_number)
+
+    def traced_memory(self):
+        """(current, peak) from tracemalloc, or zeros when this trace doesn't measure memory."""
+        if not self.memory or self.overlapped:
+            return 0, 0
+        return tracemalloc.get_traced_memory()
+
+    def end(self):
+        if self.memory:
+            self.release()
+
+    @contextmanager
+    def phase(self, name):
+        # Fold the enclosing phase's peak so far in before the counter is reset
+        parent = self.stack[-1]
+        current, peak = self.traced_memory()
+        parent["peak"] = max(parent["peak"], peak)
+        if self.memory and not self.overlapped:
+            tracemalloc.reset_peak()
+
+        entry = {"start_memory": current, "peak": 0}
+        self.stack.append(entry)
+        # Phases are listed in the order they start; nested ones are filled in first
+        slot = len(self.phases)
+        self.phases.append(None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stack.pop()
+            peak = max(entry["peak"], self.traced_memory()[1])
+            parent["peak"] = max(parent["peak"], peak)
+            self.phases[slot] = {
+                "phase": name,
+                "depth": len(self.stack) - 1,
+                "seconds": round(seconds, 6),
+                "peak_kb": round(max(peak - entry["start_memory"], 0) / 1024, 1),
+            }
+
+    def summary(self):
+        root = self.stack[0]
+        peak = max(root["peak"], self.traced_memory()[1])
+        measured = self.memory and not self.overlapped
+        phases = [p for p in self.phases if p is not None]
+        if not measured:
+            for p in phases:
+                p["peak_kb"] = None
+        return {
+            "app": self.app,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "peak_kb": round(max(peak - root["start_memory"], 0) / 1024, 1) if measured else None,
+            "phases": phases,
+        }
+
+    def render(self, summary):
+        with st.sidebar.expander("🛠️ Performance trace"):
+            measured = summary["peak_kb"] is not None
+            caption = f"Run: {summary['total_seconds'] * 1000:.1f} ms"
+            if measured:
+                caption += f", peak {summary['peak_kb']:,.0f} KiB traced"
+            elif self.overlapped:
+                caption += " (no memory figures: another session was traced at the same time)"
+            st.caption(caption)
+            rows = ["| Phase | ms | Peak KiB |", "| --- | ---: | ---: |"] if measured else ["| Phase | ms |", "| --- | ---: |"]
+            for p in summary["phases"]:
+                indent = "&nbsp;&nbsp;" * p["depth"] + ("↳ " if p["depth"] else "")
+                row = f"| {indent}{p['phase']} | {p['seconds'] * 1000:.1f} |"
+                rows.append(f"{row} {p['peak_kb']:,.0f} |" if measured else row)
+            st.markdown("\n".join(rows))
+            if self.trace_path:
+                st.caption(f"Appended to `{self.trace_path}`")
+
+    def write(self, summary):
+        if not self.trace_path:
+            return
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+def start_trace(app):
+    """Starts tracing this script run if enabled; returns the trace, or None when tracing is off."""
+    # A trace left by a run that ended early (st.stop, st.rerun, an exception) is dropped here
+    previous = getattr(_local, "trace", None)
+    if previous is not None:
+        previous.end()
+    memory = bool(os.environ.get(PERF_TRACE_ENV))
+    enabled = memory or PERF_QUERY_PARAM in st.query_params
+    _local.trace = PerfTrace(app, os.environ.get(PERF_TRACE_FILE_ENV), memory=memory) if enabled else None
+    return _local.trace
+
+
+def phase(name):
+    """Context manager timing one phase of the current run; does nothing when tracing is off."""
+    trace = getattr(_local, "trace", None)
+    return trace.phase(name) if trace is not None else nullcontext()
+
+
+def finish_trace():
+    """Shows the debug panel in the sidebar and appends the run to the trace file."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return
+    _local.trace = None
+    summary = trace.summary()
+    trace.end()
+    trace.render(summary)
+    trace.write(summary)
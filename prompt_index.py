@@ -0,0 +1,522 @@
+import json
+import os
+import re
+from array import array
+
+import numpy as np
+
+from dataset_io import (
+    atomic_write,
+    detect_compression,
+    find_sorted,
+    open_dataset,
+    skip_to,
+    sniff_json_format,
+    tail_digest,
+)
+
+# The sidecar sits next to the JSONL file: data.jsonl -> data.jsonl.pidx
+SIDECAR_SUFFIX = ".pidx"
+SIDECAR_SCHEMA_VERSION = 3
+
+# Sections of the sidecar start on this boundary so they can be memory-mapped as arrays
+SECTION_ALIGNMENT = 64
+
+# A catalog indexes every file with one of these extensions, optionally followed by a compression one
+CATALOG_EXTENSIONS = (".json", ".jsonl")
+COMPRESSED_EXTENSIONS = (".gz", ".zst", ".xz")
+
+# Whitespace between the tokens of a JSON array
+_JSON_SPACE = re.compile(r"[ \t\r\n]*")
+
+# Fuzzy search compares this many IDs at a time, bounding its temporary memory
+FUZZY_BLOCK_ROWS = 1 << 18
+# Shorter query pieces would match too many IDs to narrow anything down
+MIN_FUZZY_PIECE = 4
+
+
+def sidecar_path_for(path):
+    return path + SIDECAR_SUFFIX
+
+
+def _record_prompt_id(record):
+    prompt_id = record.get("prompt_id") if isinstance(record, dict) else None
+    return prompt_id.encode("utf-8") if isinstance(prompt_id, str) and prompt_id else None
+
+
+def scan_lines(f, offset=0):
+    """
+    One streaming pass over a binary JSONL stream. Returns (prompt_ids, offsets, lengths)
+    of every line that decodes to a record with a prompt_id; other lines are skipped.
+    Offsets are counted from `offset`, the stream's position in the file.
+    """
+    prompt_ids = []
+    offsets = array("q")
+    lengths = array("q")
+    for line in f:
+        content = line.strip()
+        if content:
+            try:
+                prompt_id = _record_prompt_id(json.loads(content))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                prompt_id = None
+            if prompt_id:
+                prompt_ids.append(prompt_id)
+                offsets.append(offset + len(line) - len(line.lstrip()))
+                lengths.append(len(content))
+        offset += len(line)
+    return prompt_ids, offsets, lengths
+
+
+def scan_json_array(data):
+    """
+    (prompt_ids, offsets, lengths) of the records of a JSON array, such as the generated
+    conversation files. The array is decoded one element at a time to find the byte
+    span of each; a malformed element or separator raises ValueError.
+    """
+    prompt_ids = []
+    offsets = array("q")
+    lengths = array("q")
+    # A BOM is kept in the text so that character and byte positions stay in step
+    text = data.decode("utf-8")
+    decoder = json.JSONDecoder()
+    # Byte offset of character `char_at`, advanced along with the decoding
+    char_at = byte_at = 0
+    pos = _JSON_SPACE.match(text, 1 if text.startswith("\ufeff") else 0).end()
+    if text[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos = _JSON_SPACE.match(text, pos + 1).end()
+    closed = text[pos:pos + 1] == "]"
+    if closed:
+        pos = _JSON_SPACE.match(text, pos + 1).end()
+    while not closed:
+        if pos >= len(text):
+            raise ValueError("Unexpected end of JSON array")
+        try:
+            record, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Could not parse JSON array: {e}") from None
+        byte_at += len(text[char_at:pos].encode("utf-8"))
+        length = len(text[pos:end].encode("utf-8"))
+        char_at = end
+        prompt_id = _record_prompt_id(record)
+        if prompt_id:
+            prompt_ids.append(prompt_id)
+            offsets.append(byte_at)
+            lengths.append(length)
+        byte_at += length
+        pos = _JSON_SPACE.match(text, end).end()
+        separator = text[pos:pos + 1]
+        if separator not in (",", "]"):
+            raise ValueError(f"Could not parse JSON array: expected ',' or ']', found {separator or 'the end'!r}")
+        closed = separator == "]"
+        pos = _JSON_SPACE.match(text, pos + 1).end()
+    if pos < len(text):
+        raise ValueError("Could not parse JSON array: extra data after the closing ']'")
+    return prompt_ids, offsets, lengths
+
+
+def scan_file(path):
+    """
+    (prompt_ids, offsets, lengths) of a JSONL file or a JSON array file, plain or
+    compressed. Offsets of compressed files are into the decompressed content.
+    """
+    with open_dataset(path) as f:
+        if sniff_json_format(f) == "json":
+            return scan_json_array(f.read())
+        return scan_lines(f)
+
+
+def _last_wins(ids, offsets, lengths):
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    keep = np.ones(len(ids), dtype=bool)
+    keep[:-1] = ids[1:] != ids[:-1]
+    order = order[keep]
+    return ids[keep], offsets[order], lengths[order]
+
+
+def build_entries(prompt_ids, offsets, lengths):
+    """
+    Sorted (ids, offsets, lengths) arrays. When a prompt_id occurs more than once the
+    last line wins, as it did when the whole file was loaded into a dict.
+    """
+    return _last_wins(
+        np.array(prompt_ids, dtype=np.bytes_) if prompt_ids else np.zeros(0, dtype="S1"),
+        np.frombuffer(offsets, dtype=np.int64) if len(offsets) else np.zeros(0, dtype=np.int64),
+        np.frombuffer(lengths, dtype=np.int64) if len(lengths) else np.zeros(0, dtype=np.int64),
+    )
+
+
+def extend_entries(entries, prompt_ids, offsets, lengths):
+    """The build_entries arrays of a file, extended with the scan of what was appended to it."""
+    ids, old_offsets, old_lengths = entries
+    new_ids, new_offsets, new_lengths = build_entries(prompt_ids, offsets, lengths)
+    width = max(ids.dtype.itemsize, new_ids.dtype.itemsize)
+    # The appended lines come last, so they win over the existing entries
+    return _last_wins(
+        np.concatenate([ids.astype(f"S{width}"), new_ids.astype(f"S{width}")]),
+        np.concatenate([old_offsets, new_offsets]),
+        np.concatenate([old_lengths, new_lengths]),
+    )
+
+
+def sorted_id_array(prompt_ids):
+    """Sorted fixed-width byte array of prompt_ids, the form the matchers below work on."""
+    encoded = [prompt_id.encode("utf-8") for prompt_id in prompt_ids]
+    ids = np.array(encoded, dtype=np.bytes_) if encoded else np.zeros(0, dtype="S1")
+    ids.sort()
+    return ids
+
+
+def prefix_matches(ids, prefix, limit=10):
+    """
+    (first `limit` IDs starting with `prefix`, total number of them), from two binary
+    searches on the sorted array.
+    """
+    key = prefix.encode("utf-8")
+    if not key or len(key) > ids.dtype.itemsize:
+        return [], 0
+    lo = int(np.searchsorted(ids, key, side="left"))
+    # No UTF-8 byte is 0xff, so this sorts after every ID with the prefix
+    hi = int(np.searchsorted(ids, key + b"\xff", side="left"))
+    return [x.decode("utf-8") for x in ids[lo:min(hi, lo + limit)]], hi - lo
+
+
+def edit_distance(a, b, max_distance):
+    """Levenshtein distance of two byte strings, or max_distance + 1 as soon as it is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+def _rows_with_piece(block, column, piece):
+    """Rows of a (rows, width) uint8 block holding `piece` at `column`, narrowed one byte at a time."""
+    rows = np.flatnonzero(block[:, column] == piece[0])
+    for j in range(1, len(piece)):
+        if not len(rows):
+            break
+        rows = rows[block[rows, column + j] == piece[j]]
+    return rows
+
+
+def fuzzy_matches(ids, query, max_distance=2, limit=10):
+    """
+    IDs within `max_distance` edits of `query` as (prompt_id, distance), closest first.
+
+    With at most k edits, one of k + 1 pieces of the query survives unchanged,
+    shifted by at most k positions. Those pieces are compared column-wise against
+    the fixed-width ID array to find the few candidates, and only the candidates
+    get an exact edit distance.
+    """
+    key = query.encode("utf-8")
+    width = ids.dtype.itemsize
+    # Keep pieces long enough to be selective
+    k = min(max_distance, len(key) // MIN_FUZZY_PIECE - 1)
+    if k < 1 or not len(ids) or len(key) > width + k:
+        return []
+
+    piece_length = len(key) // (k + 1)
+    pieces = []
+    for p in range(k + 1):
+        start = p * piece_length
+        end = len(key) if p == k else start + piece_length
+        pieces.append((start, np.frombuffer(key[start:end], dtype=np.uint8)))
+
+    matrix = ids.view(np.uint8).reshape(len(ids), width)
+    candidates = set()
+    for block_start in range(0, len(ids), FUZZY_BLOCK_ROWS):
+        block = matrix[block_start:block_start + FUZZY_BLOCK_ROWS]
+        for start, piece in pieces:
+            for shift in range(-k, k + 1):
+                column = start + shift
+                if 0 <= column and column + len(piece) <= width:
+                    candidates.update((_rows_with_piece(block, column, piece) + block_start).tolist())
+
+    results = []
+    for i in candidates:
+        candidate = bytes(ids[i])
+        distance = edit_distance(key, candidate, k)
+        if 0 < distance <= k:
+            results.append((distance, candidate))
+    results.sort()
+    return [(candidate.decode("utf-8"), distance) for distance, candidate in results[:limit]]
+
+
+def resolve_ids(ids, prompt_ids):
+    """
+    Table positions of many prompt_ids at once, -1 where missing: the whole query
+    array is joined against the sorted IDs with one vectorized searchsorted.
+    """
+    positions = np.full(len(prompt_ids), -1, dtype=np.int64)
+    if not len(prompt_ids) or not len(ids):
+        return positions
+    queries = np.array([prompt_id.encode("utf-8") for prompt_id in prompt_ids], dtype=np.bytes_)
+    candidates = np.searchsorted(ids, queries)
+    found = ids[np.minimum(candidates, len(ids) - 1)] == queries
+    positions[found] = candidates[found]
+    return positions
+
+
+def _aligned(n):
+    return -(-n // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+def append_check(path, size):
+    """
+    tail_digest of a plain JSONL file whose last line is complete, or None for files
+    that have to be rescanned when they change (compressed, JSON arrays, half-written).
+    """
+    with open(path, "rb") as f:
+        if detect_compression(f) is not None or sniff_json_format(f) == "json":
+            return None
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                return None
+    return tail_digest(path, size)
+
+
+def write_sidecar(sidecar_path, stamp, ids, offsets, lengths):
+    """
+    Writes the index as a JSON header line followed by the three arrays, each at an
+    aligned offset. Written to a temporary file first so readers never see half of it.
+    `stamp` identifies the version of the JSONL file the index was built from.
+    """
+    width = ids.dtype.itemsize
+    count = len(ids)
+    header = dict(stamp, schema=SIDECAR_SCHEMA_VERSION, count=count, id_width=width)
+    # The header's own length decides where the sections start, so reserve room for the offsets first
+    header_size = _aligned(len(json.dumps(dict(header, sections=[0, 0, 0])).encode("utf-8")) + 64)
+    sections = [header_size]
+    sections.append(_aligned(sections[0] + count * width))
+    sections.append(_aligned(sections[1] + count * 8))
+    header["sections"] = sections
+    header_line = json.dumps(header).encode("utf-8") + b"\n"
+
+    def write(f):
+        f.write(header_line.ljust(header_size, b" "))
+        for start, data in zip(sections, [ids, offsets.astype("<i8"), lengths.astype("<i8")]):
+            f.seek(start)
+            f.write(data.tobytes())
+
+    atomic_write(sidecar_path, write)
+
+
+def read_sidecar_header(sidecar_path):
+    """The sidecar's header, or None if it is missing, unreadable or from another schema."""
+    try:
+        with open(sidecar_path, "rb") as f:
+            header = json.loads(f.readline(1 << 16))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get("schema") != SIDECAR_SCHEMA_VERSION:
+        return None
+    return header
+
+
+def read_sidecar(sidecar_path, header):
+    """Memory-maps the arrays of a sidecar with the given header, or returns None."""
+    count = header["count"]
+    if count == 0:
+        return np.zeros(0, dtype="S1"), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ids_at, offsets_at, lengths_at = header["sections"]
+    try:
+        return (
+            np.memmap(sidecar_path, dtype=f"S{header['id_width']}", mode="r", offset=ids_at, shape=(count,)),
+            np.memmap(sidecar_path, dtype="<i8", mode="r", offset=offsets_at, shape=(count,)),
+            np.memmap(sidecar_path, dtype="<i8", mode="r", offset=lengths_at, shape=(count,)),
+        )
+    except (OSError, ValueError):
+        return None
+
+
+class OffsetIndex:
+    """
+    prompt_id lookups on a JSONL file through a sorted table of (prompt_id, byte
+    offset, length). A lookup is a binary search plus one seek and one json decode.
+    """
+
+    def __init__(self, path, ids, offsets, lengths):
+        self.path = path
+        self.ids = ids
+        self.offsets = offsets
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, prompt_id):
+        """Position of a prompt_id in the sorted table, or None."""
+        return find_sorted(self.ids, prompt_id)
+
+    def read_raw(self, i):
+        """The JSON text of the record at table position i, without the newline."""
+        with open_dataset(self.path) as f:
+            skip_to(f, int(self.offsets[i]))
+            return f.read(int(self.lengths[i]))
+
+    def read(self, i):
+        """Decodes the record at table position i."""
+        return json.loads(self.read_raw(i))
+
+    def get(self, prompt_id):
+        i = self.find(prompt_id)
+        return None if i is None else self.read(i)
+
+
+def open_offset_index(path, size, mtime_ns, inode):
+    """
+    Offset index of a JSON/JSONL file: the sidecar if it matches the file's size,
+    mtime and inode, otherwise built with one streaming pass and saved next to the
+    file. If the sidecar can't be written the index is only kept in memory.
+
+    When a plain JSONL file has only been appended to since its sidecar was written,
+    just the new tail is scanned and merged into the existing entries.
+
+    Compressed files work too, but every read decompresses up to the record, so
+    they are only worth it when lookups are rare.
+    """
+    sidecar_path = sidecar_path_for(path)
+    stamp = {"size": size, "mtime_ns": mtime_ns, "inode": inode}
+
+    def current_sidecar():
+        header = read_sidecar_header(sidecar_path)
+        if header is None or any(header.get(key) != value for key, value in stamp.items()):
+            return header, None
+        return header, read_sidecar(sidecar_path, header)
+
+    header, arrays = current_sidecar()
+    if arrays is not None:
+        return OffsetIndex(path, *arrays)
+
+    if (
+        header is not None
+        and header.get("inode") == inode
+        and header.get("append_check") is not None
+        and header["size"] <= size
+        and tail_digest(path, header["size"]) == header["append_check"]
+    ):
+        entries = read_sidecar(sidecar_path, header)
+        if entries is not None:
+            with open(path, "rb") as f:
+                f.seek(header["size"])
+                arrays = extend_entries(entries, *scan_lines(f, header["size"]))
+    if arrays is None:
+        arrays = build_entries(*scan_file(path))
+    write_sidecar(sidecar_path, dict(stamp, append_check=append_check(path, size)), *arrays)
+    # Prefer the memory-mapped copy so the arrays don't stay on the heap
+    return OffsetIndex(path, *(current_sidecar()[1] or arrays))
+
+
+class RecordIndex:
+    """The OffsetIndex interface over records already held in memory, keyed by prompt_id."""
+
+    def __init__(self, records_by_id, path=None):
+        # The file the records were loaded from, for catalogs
+        self.path = path
+        self.records = records_by_id
+        self.ids = sorted_id_array(records_by_id)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, prompt_id):
+        return self.records.get(prompt_id)
+
+    def read(self, i):
+        return self.records[self.ids[i].decode("utf-8")]
+
+    def read_raw(self, i):
+        return json.dumps(self.read(i), ensure_ascii=False).encode("utf-8")
+
+
+def catalog_files(directory):
+    """(path, size, mtime_ns, inode) of every JSON/JSONL file under a directory, compressed ones included, sorted by path."""
+    found = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            stem, extension = os.path.splitext(name)
+            if extension in COMPRESSED_EXTENSIONS:
+                extension = os.path.splitext(stem)[1]
+            if extension in CATALOG_EXTENSIONS:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((path, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    return sorted(found)
+
+
+class CatalogIndex:
+    """
+    The OffsetIndex interface over several files. Their tables are merged into one
+    sorted by prompt_id, where an ID held by several files has one row per file.
+    `ids` lists each prompt_id once and read(i) returns its copy in the first file;
+    get_all(prompt_id) returns every copy.
+    """
+
+    def __init__(self, indexes, skipped=()):
+        self.indexes = list(indexes)
+        # (path, error) of files that could not be indexed
+        self.skipped = list(skipped)
+        width = max((index.ids.dtype.itemsize for index in self.indexes), default=1)
+        if self.indexes:
+            merged = np.concatenate([index.ids.astype(f"S{width}") for index in self.indexes])
+            files = np.concatenate([np.full(len(index), n, dtype=np.int32) for n, index in enumerate(self.indexes)])
+            rows = np.concatenate([np.arange(len(index), dtype=np.int64) for index in self.indexes])
+        else:
+            merged, files, rows = np.zeros(0, dtype="S1"), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        # Stable, so the copies of an ID stay in file order
+        order = np.argsort(merged, kind="stable")
+        merged = merged[order]
+        self.files = files[order]
+        self.rows = rows[order]
+        first = np.ones(len(merged), dtype=bool)
+        first[1:] = merged[1:] != merged[:-1]
+        # Row in the merged table of each ID's first copy; the copies run up to the next ID's
+        self.starts = np.append(np.flatnonzero(first), len(merged))
+        self.ids = merged[first]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, prompt_id):
+        """Position of a prompt_id in `ids`, or None."""
+        return find_sorted(self.ids, prompt_id)
+
+    def _copy(self, row):
+        index = self.indexes[self.files[row]]
+        return index, int(self.rows[row])
+
+    def read(self, i):
+        index, row = self._copy(self.starts[i])
+        return index.read(row)
+
+    def read_raw(self, i):
+        index, row = self._copy(self.starts[i])
+        return index.read_raw(row)
+
+    def get(self, prompt_id):
+        i = self.find(prompt_id)
+        return None if i is None else self.read(i)
+
+    def get_all(self, prompt_id):
+        """(path, record) of every file holding the prompt_id, in path order."""
+        i = self.find(prompt_id)
+        if i is None:
+            return []
+        copies = []
+        for row in range(self.starts[i], self.starts[i + 1]):
+            index, position = self._copy(row)
+            copies.append((index.path, index.read(position)))
+        return copies
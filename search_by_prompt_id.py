@@ -1,6 +1,21 @@
 import streamlit as st
+import csv
+import io
 import json
 import os
+import re
+
+from dataset_io import detect_compression, open_dataset, open_decompressed, sniff_json_format, tail_digest
+from prompt_index import (
+    CatalogIndex,
+    RecordIndex,
+    catalog_files,
+    fuzzy_matches,
+    open_offset_index,
+    prefix_matches,
+    resolve_ids,
+)
+from perf_trace import start_trace, phase, finish_trace
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -8,42 +23,262 @@ st.set_page_config(
     page_icon="🔍",
     layout="wide"
 )
+start_trace("search_by_prompt_id")
 
 # --- cached Data Loading ---
-@st.cache_data
+# Loaded versions of files kept in memory
+LOADED_FILES_KEPT = 4
+
+@st.cache_resource
+def get_loaded_files():
+    """The latest load of each file: path -> (inode, size, append check, records). Shared by all sessions."""
+    return {}
+
+def parse_records(f, data_map):
+    """
+    Adds the records of a JSONL stream to data_map; returns whether the stream ends with a
+    complete line. Malformed lines and non-object records are skipped, as scan_lines does.
+    """
+    ends_line = True
+    for line in f:
+        ends_line = line.endswith(b"\n")
+        if line.strip():
+            try:
+                item = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            pid = item.get('prompt_id') if isinstance(item, dict) else None
+            if pid:
+                data_map[pid] = item
+    return ends_line
+
+@st.cache_resource(max_entries=LOADED_FILES_KEPT)
+def _load_data(file_path, size, mtime_ns, inode):
+    # Read errors propagate, so nothing is cached and load_catalog_index lists the file as skipped
+    loaded_files = get_loaded_files()
+    previous = loaded_files.get(file_path)
+    # Same inode, not shorter and the old end unchanged: only the tail is new. For
+    # compressed files the tail is an appended gzip member, zstd frame or xz stream.
+    if (
+        previous is not None
+        and previous[0] == inode
+        and previous[2] is not None
+        and previous[1] <= size
+        and tail_digest(file_path, previous[1]) == previous[2]
+    ):
+        data_map = dict(previous[3])
+        with open(file_path, "rb") as raw, phase("parse tail"):
+            raw.seek(previous[1])
+            with open_decompressed(raw) as f:
+                ends_line = parse_records(f, data_map)
+    else:
+        data_map = {}
+        with open_dataset(file_path) as f, phase("parse"):
+            if sniff_json_format(f) == "json":
+                # A JSON array, e.g. generated conversations; appending to it isn't an append
+                for item in json.load(f):
+                    if isinstance(item, dict) and item.get('prompt_id'):
+                        data_map[item['prompt_id']] = item
+                ends_line = False
+            else:
+                ends_line = parse_records(f, data_map)
+
+    loaded_files.pop(file_path, None)
+    loaded_files[file_path] = (inode, size, tail_digest(file_path, size) if ends_line else None, data_map)
+    while len(loaded_files) > LOADED_FILES_KEPT:
+        loaded_files.pop(next(iter(loaded_files)))
+    return data_map
+
 def load_data(file_path):
     """
-    Loads JSONL data and caches it so re-running the app is instant.
+    Loads JSONL data or a JSON array (plain, gzip, zstd or xz) and caches it so re-running the app is instant.
     Returns a dictionary keyed by prompt_id for O(1) lookup speed.
+
+    The cache is keyed on the file's size, mtime and inode as well as its path, so a
+    file regenerated in place is reloaded; one that was only appended to just has its
+    new tail parsed.
     """
     if not os.path.exists(file_path):
         return None
-    
-    data_map = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    item = json.loads(line)
-                    pid = item.get('prompt_id')
-                    if pid:
-                        data_map[pid] = item
-        return data_map
-    except Exception as e:
-        st.error(f"Error reading file: {e}")
-        return {}
+    stat = os.stat(file_path)
+    return _load_data(file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+@st.cache_resource(show_spinner="Indexing file...", max_entries=64)
+def load_offset_index(file_path, size, mtime_ns, inode):
+    """Sidecar-backed prompt_id index of a JSON/JSONL file; rebuilt, or extended after an append, when the file changes."""
+    return open_offset_index(file_path, size, mtime_ns, inode)
+
+@st.cache_resource(max_entries=64)
+def load_record_index(file_path, size, mtime_ns, inode):
+    """In-memory prompt_id index of a compressed file, which can't be seeked into."""
+    return RecordIndex(load_data(file_path), file_path)
+
+def load_file_index(file_path, size, mtime_ns, inode):
+    """
+    The prompt_id index of one version of a file: .get(prompt_id), len() and the sorted
+    .ids array. Plain files only keep prompt_ids and byte offsets; compressed files are
+    fully loaded, since reading a record from them would decompress everything before it.
+    """
+    with open(file_path, "rb") as f:
+        compressed = detect_compression(f) is not None
+    if compressed:
+        return load_record_index(file_path, size, mtime_ns, inode)
+    return load_offset_index(file_path, size, mtime_ns, inode)
+
+def load_prompt_index(file_path):
+    """The load_file_index of a file's current version, or None if it doesn't exist."""
+    if not os.path.exists(file_path):
+        return None
+    stat = os.stat(file_path)
+    return load_file_index(file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+@st.cache_resource(show_spinner="Indexing directory...", max_entries=4)
+def load_catalog_index(file_stats):
+    """
+    Merges the indexes of the given (path, size, mtime_ns, inode) files. When a file is added
+    or changed only that one is scanned; the others come from the cache or their sidecars.
+    """
+    indexes, skipped = [], []
+    for stat in file_stats:
+        try:
+            indexes.append(load_file_index(*stat))
+        except Exception as e:
+            skipped.append((stat[0], str(e) or type(e).__name__))
+    return CatalogIndex(indexes, skipped)
+
+def load_catalog(directory):
+    """Merged prompt_id index of every JSON/JSONL file under a directory. None if it doesn't exist."""
+    if not os.path.isdir(directory):
+        return None
+    return load_catalog_index(tuple(catalog_files(directory)))
+
+def use_suggestion(prompt_id):
+    st.session_state["prompt_query"] = prompt_id
+
+def parse_id_list(text):
+    """Prompt IDs from pasted text or a file: split on whitespace, commas and semicolons, quotes stripped, duplicates dropped."""
+    tokens = (token.strip("\"'") for token in re.split(r"[\s,;]+", text))
+    # A CSV header is not an ID
+    return list(dict.fromkeys(token for token in tokens if token and token != "prompt_id"))
+
+def parse_id_table(text, delimiter):
+    """Prompt IDs from a CSV/TSV file: the prompt_id column if there is a header with one, otherwise the first column."""
+    rows = [row for row in csv.reader(io.StringIO(text), delimiter=delimiter) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = 0
+    if "prompt_id" in header:
+        column = header.index("prompt_id")
+        rows = rows[1:]
+    cells = (row[column].strip() for row in rows if len(row) > column)
+    return list(dict.fromkeys(cell for cell in cells if cell))
+
+def step_batch_hit(delta):
+    st.session_state["batch_hit"] += delta
+
+def render_copies(prompt_id, copies, directory):
+    """The copies of a sample found in a catalog, with a tab per file when there are several."""
+    labels = [os.path.relpath(path, directory) for path, _ in copies]
+    st.success(f"Found ID: `{prompt_id}` in {len(copies)} file{'s' if len(copies) > 1 else ''}")
+    if len(copies) == 1:
+        st.caption(f"📄 `{labels[0]}`")
+        render_sample(copies[0][1])
+        return
+    for tab, (_, sample) in zip(st.tabs(labels), copies):
+        with tab:
+            render_sample(sample)
+
+def render_sample(sample):
+    """Conversation on the left, rubrics and ideal completion on the right."""
+    # Create two columns: Chat (Left) vs Rubrics (Right)
+    col1, col2 = st.columns([1.5, 1])
+
+    # --- LEFT COLUMN: Conversation ---
+    with col1, phase("chat rendering"):
+        st.subheader("🗣️ Conversation History")
+        prompt_data = sample.get('prompt', [])
+        
+        if isinstance(prompt_data, list):
+            for msg in prompt_data:
+                role = msg.get('role', 'unknown').lower()
+                content = msg.get('content', '')
+                
+                # Streamlit has a built-in chat message component
+                with st.chat_message(role):
+                    st.markdown(content)
+        else:
+            st.warning("No conversation format detected.")
+
+    # --- RIGHT COLUMN: Rubrics ---
+    with col2, phase("rubric rendering"):
+        st.subheader("📋 Grading Rubrics")
+        rubrics = sample.get('rubrics', [])
+        
+        if rubrics:
+            for i, r in enumerate(rubrics, 1):
+                # Use an expander for each rubric item to save space
+                points = r.get('points', 0)
+                color = "green" if points > 0 else "red"
+                
+                with st.expander(f"Criterion {i} (:bf-{color}[{points} pts])"):
+                    st.markdown(f"**Description:**\n{r.get('criterion')}")
+                    st.caption(f"**Tags:** {', '.join(r.get('tags', []))}")
+        else:
+            st.info("No rubrics found for this sample.")
+
+        # Optional: Show 'Ideal Completion' if it exists
+        ideal_data = sample.get('ideal_completions_data')
+        if ideal_data:
+            st.divider()
+            st.subheader("✨ Ideal Completion")
+            with st.expander("Show Ideal Response"):
+                st.write(ideal_data.get('ideal_completion'))
+
 
 # --- Sidebar: Configuration & Search ---
 with st.sidebar:
     st.header("📂 Data Source")
-    # Default file path; user can change this in the UI
-    file_path = st.text_input("File Path (.jsonl)", value="healthbench/turns/group_2_5_turns.jsonl")
+    catalog_mode = st.radio("Source", ["Single file", "Directory catalog"], horizontal=True) == "Directory catalog"
+    if catalog_mode:
+        file_path = st.text_input(
+            "Directory",
+            value="healthbench",
+            help="Every .json and .jsonl file below it, compressed or not, is searched at once.",
+        )
+    else:
+        # Default file path; user can change this in the UI
+        file_path = st.text_input("File Path (.jsonl, .jsonl.gz, .jsonl.zst)", value="healthbench/turns/group_2_5_turns.jsonl")
     
     st.divider()
     
     st.header("🔍 Search")
-    # Using a text input for ID pasting
-    search_query = st.text_input("Paste Prompt ID here:")
+    batch_mode = st.radio("Mode", ["Single ID", "Batch"], horizontal=True) == "Batch"
+    search_query = ""
+    batch_ids = []
+    if batch_mode:
+        batch_text = st.text_area("Prompt IDs (one per line, or comma separated):", height=150)
+        batch_file = st.file_uploader(
+            "...or upload a list of IDs",
+            type=["txt", "csv", "tsv"],
+            help="CSV/TSV files: the prompt_id column, or the first column if there is no such header.",
+        )
+        batch_ids = parse_id_list(batch_text)
+        if batch_file is not None:
+            content = batch_file.getvalue().decode("utf-8-sig", errors="replace")
+            extension = os.path.splitext(batch_file.name)[1].lower()
+            if extension in (".csv", ".tsv"):
+                file_ids = parse_id_table(content, "\t" if extension == ".tsv" else ",")
+            else:
+                file_ids = parse_id_list(content)
+            batch_ids = list(dict.fromkeys(batch_ids + file_ids))
+    else:
+        # Using a text input for ID pasting
+        search_query = st.text_input(
+            "Paste Prompt ID here:",
+            key="prompt_query",
+            help="Full IDs, their first characters, or IDs with one or two typos.",
+        )
     
     # Optional: Add a dropdown if the dataset is small enough
     # st.divider()
@@ -52,74 +287,123 @@ with st.sidebar:
 # --- Main App Logic ---
 if not file_path:
     st.warning("Please enter a file path in the sidebar.")
+    finish_trace()
     st.stop()
 
 # Load data
-data_map = load_data(file_path)
+load_error = None
+with phase("load"):
+    try:
+        data_map = load_catalog(file_path) if catalog_mode else load_prompt_index(file_path)
+    except Exception as e:
+        load_error = e
+
+if load_error is not None:
+    st.error(f"❌ Error reading `{file_path}`: {load_error}")
+    finish_trace()
+    st.stop()
 
 if data_map is None:
-    st.error(f"❌ File not found: `{file_path}`")
+    st.error(f"❌ {'Directory' if catalog_mode else 'File'} not found: `{file_path}`")
     st.info("Make sure the file exists in the same directory or provide the full path.")
+    finish_trace()
     st.stop()
 
+if catalog_mode and data_map.skipped:
+    with st.sidebar.expander(f"⚠️ Files that could not be indexed ({len(data_map.skipped)})"):
+        for path, error in data_map.skipped:
+            st.caption(f"`{os.path.relpath(path, file_path)}`: {error}")
+
 # --- Display Logic ---
-if search_query:
+if batch_mode and batch_ids:
+    # Resolve the whole list in one vectorized join against the sorted IDs
+    with phase("batch join"):
+        table_positions = resolve_ids(data_map.ids, batch_ids)
+    hits = [(pid, int(pos)) for pid, pos in zip(batch_ids, table_positions) if pos >= 0]
+    missing = [pid for pid, pos in zip(batch_ids, table_positions) if pos < 0]
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Requested", len(batch_ids))
+    c2.metric("Found", len(hits))
+    c3.metric("Missing", len(missing))
+    if missing:
+        with st.expander(f"❌ {len(missing)} IDs not found in the dataset"):
+            st.code("\n".join(missing), language=None)
+
+    if hits:
+        st.download_button(
+            "⬇️ Export hits (JSONL)",
+            data=lambda: b"".join(data_map.read_raw(pos) + b"\n" for _, pos in hits),
+            file_name="prompt_id_hits.jsonl",
+            mime="application/jsonl",
+            on_click="ignore",
+        )
+        st.divider()
+
+        # Page through the hits
+        if st.session_state.get("batch_hit", 0) >= len(hits):
+            st.session_state["batch_hit"] = 0
+        col_prev, col_pick, col_next = st.columns([1, 4, 1])
+        with col_pick:
+            hit = st.selectbox(
+                "Hit",
+                range(len(hits)),
+                format_func=lambda i: f"{i + 1} / {len(hits)} · {hits[i][0]}",
+                key="batch_hit",
+                label_visibility="collapsed",
+            )
+        col_prev.button("⬅️ Previous", on_click=step_batch_hit, args=(-1,), disabled=hit == 0)
+        col_next.button("Next ➡️", on_click=step_batch_hit, args=(1,), disabled=hit == len(hits) - 1)
+
+        if catalog_mode:
+            with phase("lookup"):
+                copies = data_map.get_all(hits[hit][0])
+            render_copies(hits[hit][0], copies, file_path)
+        else:
+            with phase("lookup"):
+                sample = data_map.read(hits[hit][1])
+            st.success(f"Found ID: `{hits[hit][0]}`")
+            render_sample(sample)
+elif batch_mode:
+    st.info("👈 Paste prompt IDs or upload a file with one ID per line.")
+elif search_query:
     # Remove whitespace
     clean_id = search_query.strip()
     
-    # Find the sample
-    sample = data_map.get(clean_id)
+    # Find the sample; otherwise look for IDs starting with it or a typo or two away
+    prefix_hits, prefix_total, fuzzy_hits = [], 0, []
+    with phase("lookup"):
+        sample = data_map.get(clean_id)
+        if not sample:
+            prefix_hits, prefix_total = prefix_matches(data_map.ids, clean_id)
+            if not prefix_hits:
+                fuzzy_hits = fuzzy_matches(data_map.ids, clean_id)
+
+    # A prefix only one ID starts with is as good as the full ID
+    if not sample and prefix_total == 1:
+        clean_id = prefix_hits[0]
+        sample = data_map.get(clean_id)
     
-    if sample:
+    if sample and catalog_mode:
+        render_copies(clean_id, data_map.get_all(clean_id), file_path)
+
+    elif sample:
         st.success(f"Found ID: `{clean_id}`")
         st.divider()
 
-        # Create two columns: Chat (Left) vs Rubrics (Right)
-        col1, col2 = st.columns([1.5, 1])
-
-        # --- LEFT COLUMN: Conversation ---
-        with col1:
-            st.subheader("🗣️ Conversation History")
-            prompt_data = sample.get('prompt', [])
-            
-            if isinstance(prompt_data, list):
-                for msg in prompt_data:
-                    role = msg.get('role', 'unknown').lower()
-                    content = msg.get('content', '')
-                    
-                    # Streamlit has a built-in chat message component
-                    with st.chat_message(role):
-                        st.markdown(content)
-            else:
-                st.warning("No conversation format detected.")
-
-        # --- RIGHT COLUMN: Rubrics ---
-        with col2:
-            st.subheader("📋 Grading Rubrics")
-            rubrics = sample.get('rubrics', [])
-            
-            if rubrics:
-                for i, r in enumerate(rubrics, 1):
-                    # Use an expander for each rubric item to save space
-                    points = r.get('points', 0)
-                    color = "green" if points > 0 else "red"
-                    
-                    with st.expander(f"Criterion {i} (:bf-{color}[{points} pts])"):
-                        st.markdown(f"**Description:**\n{r.get('criterion')}")
-                        st.caption(f"**Tags:** {', '.join(r.get('tags', []))}")
-            else:
-                st.info("No rubrics found for this sample.")
-
-            # Optional: Show 'Ideal Completion' if it exists
-            ideal_data = sample.get('ideal_completions_data')
-            if ideal_data:
-                st.divider()
-                st.subheader("✨ Ideal Completion")
-                with st.expander("Show Ideal Response"):
-                    st.write(ideal_data.get('ideal_completion'))
+        render_sample(sample)
 
     else:
         st.error(f"❌ ID `{clean_id}` not found in the dataset.")
+        if prefix_hits:
+            st.markdown(f"**{prefix_total} IDs start with `{clean_id}`:**")
+        elif fuzzy_hits:
+            st.markdown("**Did you mean:**")
+        for pid in prefix_hits:
+            st.button(pid, key=f"suggest_{pid}", on_click=use_suggestion, args=(pid,))
+        for pid, distance in fuzzy_hits:
+            edits = "1 edit" if distance == 1 else f"{distance} edits"
+            st.button(f"{pid} ({edits})", key=f"suggest_{pid}", on_click=use_suggestion, args=(pid,))
 else:
     # Welcome Screen
     st.title("JSONL Data Viewer")
@@ -131,4 +415,9 @@ else:
     * The grading rubrics
     * The ideal completions
     """)
-    st.info(f"Loaded {len(data_map)} samples from `{file_path}`.")
+    if catalog_mode:
+        st.info(f"Indexed {len(data_map)} samples from {len(data_map.indexes)} files under `{file_path}`.")
+    else:
+        st.info(f"Indexed {len(data_map)} samples from `{file_path}`.")
+
+finish_trace()
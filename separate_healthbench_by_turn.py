@@ -1,6 +1,9 @@
+import io
 import json
 import os
 
+from dataset_io import open_dataset
+
 def classify_conversations(input_file):
     # Define output filenames
     output_files = {
@@ -18,7 +21,8 @@ def classify_conversations(input_file):
     handles = {key: open(filename, 'w', encoding='utf-8') for key, filename in output_files.items()}
 
     try:
-        with open(input_file, 'r', encoding='utf-8') as f_in:
+        # gzip, zstd and xz dumps are decompressed on the fly
+        with io.TextIOWrapper(open_dataset(input_file), encoding='utf-8') as f_in:
             for line_number, line in enumerate(f_in, 1):
                 line = line.strip()
                 if not line:
@@ -148,6 +148,7 @@
 # print(f"Done. Saved to {OUTPUT_JSON} and {OUTPUT_CSV}")
 
 
+import io
 import json
 import csv
 import torch
@@ -155,6 +156,8 @@ import pandas as pd
 import random
 from sentence_transformers import SentenceTransformer, util
 
+from dataset_io import open_dataset
+
 # --- CONFIGURATION ---
 FILE_PATH_A = 'farm2vets topics/28-01-2026 conversation QAs.json'
 FILE_PATH_B = 'healthbench/turns/group_2_5_turns.jsonl'
@@ -177,7 +180,7 @@ def sample_num_turns():
 def load_data_a(file_path):
     texts = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with io.TextIOWrapper(open_dataset(file_path), encoding='utf-8') as f:
             data = json.load(f)
         for item in data:
             combined_text = (
@@ -195,7 +198,8 @@ def load_data_b(file_path):
     texts = []
     raw_data = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # gzip, zstd and xz dumps are decompressed on the fly
+        with io.TextIOWrapper(open_dataset(file_path), encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
                 if not line: continue
@@ -0,0 +1,88 @@
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """Lowercased word tokens of a text."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 ranking over a fixed list of documents.
+
+    Postings are stored as flat numpy arrays (CSR layout: term -> slice of
+    document ids and term frequencies), so a query only touches the postings
+    of its own terms.
+    """
+
+    def __init__(self, texts):
+        vocab = {}
+        term_ids = array("i")
+        doc_ids = array("i")
+        freqs = array("i")
+        doc_lengths = array("i")
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = Counter(tokens)
+            for term, count in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                freqs.append(count)
+            doc_ids.extend([doc_id] * len(counts))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        # Stable sort keeps document ids ascending inside each posting list
+        order = np.argsort(term_ids, kind="stable")
+        self.postings_doc = np.frombuffer(doc_ids, dtype=np.int32)[order]
+        self.postings_tf = np.frombuffer(freqs, dtype=np.int32)[order].astype(np.float32)
+        self.term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=self.term_ptr[1:])
+
+        self.vocab = vocab
+        self.doc_lengths = np.frombuffer(doc_lengths, dtype=np.int32).astype(np.float32)
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+
+    def search(self, query):
+        """
+        Returns (doc_ids, scores) of the documents containing every query term,
+        best match first. Unknown terms match nothing.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        empty = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if not terms or self.num_docs == 0:
+            return empty
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = np.zeros(self.num_docs, dtype=np.int16)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+
+        for term in terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                return empty
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end]
+            df = end - start
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            # Document ids are unique within a posting list, so plain fancy-index addition is safe
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+            matched[docs] += 1
+
+        hits = np.flatnonzero(matched == len(terms)).astype(np.int32)
+        hit_scores = scores[hits]
+        order = np.argsort(-hit_scores, kind="stable")
+        return hits[order], hit_scores[order]